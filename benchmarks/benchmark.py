@@ -0,0 +1,335 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+Benchmarks for the hot paths of Graphs.
+
+Times the importers, data operations, equation sampling, project I/O, limit
+optimization and undo/redo on synthetic datasets. Results are stored as JSON
+and can be compared against a saved baseline:
+
+    python3 benchmarks/benchmark.py --output baseline.json
+    python3 benchmarks/benchmark.py --baseline baseline.json
+
+Benchmarks of Data need a running application and are skipped when no
+display is available. Run `meson test --benchmark` to use the build tree.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import gi
+
+gi.require_version("Adw", "1")
+gi.require_version("Gtk", "4.0")
+gi.require_version("Graphs", "1")
+from gi.repository import Gio  # noqa: E402, I202
+
+from graphs import batch, parse_file, project, utilities  # noqa: E402
+from graphs.item import DataItem  # noqa: E402
+from graphs.operations import DataHelper, DataOperations  # noqa: E402
+
+import numpy  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 100_000, 10_000_000]
+EQUATION = "sin(x)*exp(-x/10)"
+STYLE = {
+    "lines.linestyle": "solid",
+    "lines.linewidth": 3,
+    "lines.marker": "none",
+    "lines.markersize": 7,
+}
+
+# Minimum time spent on each benchmark, in seconds
+_MIN_TIME = 0.2
+_MAX_REPEATS = 100
+_WARM_UP_SIZE = 100
+# Savitzky-Golay windows grow with the data, so large sizes take hours
+_SAVGOL_MAX_SIZE = 100_000
+
+
+def generate_data(size: int) -> (numpy.ndarray, numpy.ndarray):
+    """Generate a noisy spectrum with sorted x-values."""
+    rng = numpy.random.default_rng(size)
+    xdata = numpy.linspace(0, 100, size)
+    ydata = numpy.exp(-(xdata - 50)**2 / 20) \
+        + numpy.sin(xdata) / 10 + rng.normal(0, 0.01, size)
+    return xdata, ydata
+
+
+def generate_columns(path: str, size: int) -> None:
+    """Write a columns file with a header."""
+    xdata, ydata = generate_data(size)
+    numpy.savetxt(
+        path, numpy.column_stack((xdata, ydata)),
+        header="X Value\tY Value", comments="", delimiter="\t",
+    )
+
+
+def generate_xrdml(path: str, size: int) -> None:
+    """Write a minimal xrdml file."""
+    ydata = numpy.abs(generate_data(size)[1]) * 1000
+    with open(path, "w") as file:
+        file.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<xrdMeasurements><xrdMeasurement><scan scanAxis="2Theta">'
+            "<dataPoints>"
+            '<positions axis="2Theta" unit="deg">'
+            "<startPosition>10</startPosition>"
+            "<endPosition>90</endPosition></positions>"
+            "<commonCountingTime>1</commonCountingTime>"
+            '<intensities unit="counts">',
+        )
+        file.write(" ".join(f"{value:.0f}" for value in ydata))
+        file.write(
+            "</intensities></dataPoints></scan>"
+            "</xrdMeasurement></xrdMeasurements>\n",
+        )
+
+
+def measure(function, setup=None) -> float:
+    """
+    Measure the fastest run of function.
+
+    Function is repeated until at least `_MIN_TIME` seconds have passed. If
+    given, setup is called before every run and its result is passed as
+    arguments, without being timed.
+    """
+    times = []
+    start = time.perf_counter()
+    while not times or (
+        time.perf_counter() - start < _MIN_TIME and len(times) < _MAX_REPEATS
+    ):
+        args = setup() if setup is not None else ()
+        run_start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - run_start)
+    return min(times)
+
+
+def _run_operation(name: str, item: DataItem, *args) -> None:
+    selection = DataHelper.get_xydata(0, None, item)
+    result = DataOperations.compute(item, selection, name, *args)
+    success, message = DataOperations.apply(item, selection, result, 0)
+    if not success:
+        raise RuntimeError(f"{name}: {message}")
+
+
+def _get_operations(settings: Gio.Settings) -> dict:
+    """Get the arguments for every DataOperations callback."""
+    smoothen_settings = settings.get_child("actions").get_child("smoothen")
+    return {
+        "translate_x": [2.0],
+        "translate_y": [2.0],
+        "multiply_x": [2.0],
+        "multiply_y": [2.0],
+        "normalize": [],
+        "smoothen_savgol": [0, smoothen_settings],
+        "smoothen_moving_average": [1, smoothen_settings],
+        "center_max_y": [0],
+        "center_middle_x": [1],
+        "cut": [],
+        "derivative": [],
+        "integral": [],
+        "fft": [],
+        "inverse_fft": [],
+        "transform": ["x*2", "y+x", False],
+    }
+
+
+def benchmark_size(size: int, directory: str, settings: Gio.Settings) -> dict:
+    """Run all benchmarks that do not need a running application."""
+    results = {}
+    xdata, ydata = generate_data(size)
+
+    path = os.path.join(directory, f"data-{size}.txt")
+    generate_columns(path, size)
+    file = Gio.File.new_for_path(path)
+    params = settings.get_child("import-params").get_child("columns")
+    results["import_from_columns"] = measure(
+        lambda: parse_file.import_from_columns(params, STYLE, file),
+    )
+
+    path = os.path.join(directory, f"data-{size}.xrdml")
+    generate_xrdml(path, size)
+    file = Gio.File.new_for_path(path)
+    results["import_from_xrdml"] = measure(
+        lambda: parse_file.import_from_xrdml(None, STYLE, file),
+    )
+
+    for name, args in _get_operations(settings).items():
+        if name == "smoothen_savgol" and size > _SAVGOL_MAX_SIZE:
+            continue
+        operation = name.split("_")[0] \
+            if name.startswith(("smoothen", "center")) else name
+        results[f"operation_{name}"] = measure(
+            lambda item, operation=operation, args=args:
+            _run_operation(operation, item, *args),
+            lambda: (DataItem.new(STYLE, xdata, ydata),),
+        )
+
+    results["equation_to_data"] = measure(
+        lambda: utilities.equation_to_data(EQUATION, [0, 10], size),
+    )
+
+    item_ = DataItem.new(STYLE, xdata, ydata)
+    project_dict = batch.get_project_dict([item_.to_dict()])
+    file = Gio.File.new_for_path(os.path.join(directory, f"{size}.graphs"))
+    results["save_project_dict"] = measure(
+        lambda: project.save_project_dict(file, dict(project_dict)),
+    )
+    results["read_project_file"] = measure(
+        lambda: project.read_project_file(file),
+    )
+    return results
+
+
+def get_data():
+    """Get Data of a started application, or None without a display."""
+    from gi.repository import Gtk
+    if not Gtk.init_check():
+        return None
+    resources = os.environ.get("GRAPHS_OVERRIDE_RESOURCES")
+    if resources:
+        Gio.Resource.load(resources)._register()
+    from graphs.application import PythonApplication
+    from graphs.data import Data
+    application = PythonApplication(
+        application_id="se.sjoerd.Graphs",
+        flags=Gio.ApplicationFlags.NON_UNIQUE,
+    )
+    application.register(None)
+    return Data(application)
+
+
+def benchmark_data(size: int, data) -> dict:
+    """Run the benchmarks of Data."""
+    results = {}
+    xdata, ydata = generate_data(size)
+    data.set_items([])
+    data.add_items([
+        DataItem.new(data.get_selected_style_params(), xdata, ydata * index)
+        for index in range(1, 5)
+    ])
+    results["optimize_limits"] = measure(data.optimize_limits)
+
+    item_ = data[0]
+    item_.props.ydata = ydata + 1
+    data.add_history_state()
+
+    def undo_redo():
+        data.undo()
+        data.redo()
+
+    results["undo_redo"] = measure(undo_redo)
+
+    # A change of a small range is stored as range instead of full arrays
+    new_ydata = item_.props.ydata.copy()
+    new_ydata[:10] = 0
+    item_.props.ydata = new_ydata
+    data.add_history_state()
+    results["undo_redo_range"] = measure(undo_redo)
+    return results
+
+
+def run(sizes: list[int]) -> dict:
+    """Run all benchmarks and return the results."""
+    settings = batch.get_settings()
+    results = {}
+    data = get_data()
+    if data is None:
+        logging.warning("No display available, skipping benchmarks of Data")
+    with tempfile.TemporaryDirectory() as directory:
+        # Warm up lazy imports and caches before timing anything
+        benchmark_size(_WARM_UP_SIZE, directory, settings)
+        for size in sizes:
+            logging.info("Benchmarking %d points", size)
+            size_results = benchmark_size(size, directory, settings)
+            if data is not None:
+                size_results.update(benchmark_data(size, data))
+            for name, duration in size_results.items():
+                results[f"{name}[{size}]"] = duration
+
+    results["equation_to_data_adaptive"] = measure(
+        lambda: utilities.equation_to_data(EQUATION, [0, 10], None),
+    )
+    return {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    tolerance: float,
+    min_difference: float,
+) -> list[str]:
+    """Get the names of benchmarks that are slower than the baseline."""
+    regressions = []
+    for name, duration in sorted(results["results"].items()):
+        old_duration = baseline["results"].get(name)
+        if old_duration is None:
+            logging.info("%-45s %12.6fs", name, duration)
+            continue
+        ratio = duration / old_duration
+        regressed = ratio > tolerance \
+            and duration - old_duration > min_difference
+        logging.log(
+            logging.WARNING if regressed else logging.INFO,
+            "%-45s %12.6fs %12.6fs %6.2fx",
+            name, duration, old_duration, ratio,
+        )
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: list[str]) -> int:
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+        help="amount of points of the generated datasets",
+    )
+    parser.add_argument("--output", help="file to store the results in")
+    parser.add_argument("--baseline", help="results to compare against")
+    parser.add_argument(
+        "--tolerance", type=float, default=1.25,
+        help="slowdown factor that is reported as regression",
+    )
+    parser.add_argument(
+        "--min-difference", type=float, default=1e-3,
+        help="ignore slowdowns of less seconds than this",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(levelname)s: %(message)s", level="INFO")
+
+    results = run(args.sizes)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4, sort_keys=True)
+    baseline = {"results": {}}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    regressions = compare(
+        results, baseline, args.tolerance, args.min_difference,
+    )
+    if regressions:
+        logging.error("%d benchmarks regressed", len(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -6,10 +6,14 @@ Provides GObject based wrappers for mpl artists.
 """
 from gi.repository import GObject, Graphs
 
-from graphs import misc, utilities
+from graphs import misc, scales, utilities
 
 from matplotlib import artist, pyplot
-from matplotlib.figure import Figure
+
+import numpy
+
+# Only decimate if there are more points than this per pixel column
+_DECIMATION_THRESHOLD = 4
 
 
 def new_for_item(canvas: Graphs.Canvas, item: Graphs.Item):
@@ -17,7 +21,7 @@ def new_for_item(canvas: Graphs.Canvas, item: Graphs.Item):
     Create a new artist for an item.
 
     Creates bindings between item and artist properties so changes are handled
-    automatically.
+    automatically, until the wrapper is removed.
     """
     match item.__gtype_name__:
         case "GraphsDataItem":
@@ -38,21 +42,152 @@ def new_for_item(canvas: Graphs.Canvas, item: Graphs.Item):
     )
     for prop in dir(artist_wrapper.props):
         if not (prop == "label" and artist_wrapper.legend):
-            item.bind_property(prop, artist_wrapper, prop, 0)
+            artist_wrapper._bindings.append(
+                item.bind_property(prop, artist_wrapper, prop, 0),
+            )
     artist_wrapper.connect("notify", lambda _x, _y: canvas.update_legend())
     return artist_wrapper
 
 
+def _first_per_segment(indices, segments):
+    """Get the first index for each segment in sorted indices."""
+    changes = numpy.diff(segments[indices], prepend=-1)
+    return indices[numpy.flatnonzero(changes)]
+
+
+def _decimate(ydata: numpy.ndarray, columns: numpy.ndarray) -> numpy.ndarray:
+    """
+    Get the indices of the points needed to draw a line.
+
+    For every pixel column, the first, last, minimum and maximum point are
+    kept, which renders identical to drawing all points. Columns must be
+    monotonic.
+    """
+    bounds = numpy.flatnonzero(numpy.diff(columns)) + 1
+    starts = numpy.concatenate(([0], bounds))
+    stops = numpy.append(bounds, len(columns))
+    segments = numpy.repeat(numpy.arange(len(starts)), stops - starts)
+    indices = [starts, stops - 1]
+    for reduce in (numpy.fmin, numpy.fmax):
+        extremes = reduce.reduceat(ydata, starts)[segments]
+        indices.append(_first_per_segment(
+            numpy.flatnonzero(ydata == extremes), segments,
+        ))
+    # Keep gaps in the line
+    indices.append(_first_per_segment(
+        numpy.flatnonzero(numpy.isnan(ydata)), segments,
+    ))
+    return numpy.unique(numpy.concatenate(indices))
+
+
+def _get_view_indices(axis, xdata: numpy.ndarray, *ydata) -> tuple:
+    """
+    Get the indices of the points of sorted data needed to draw the view.
+
+    Points up to one view width beyond both sides of the view are kept, and
+    decimated to the pixel columns of the axis for every given array of
+    y-values. Also returns the covered view, see `_is_view_covered`.
+    """
+    transform = axis.get_xaxis().get_transform()
+    view = transform.transform(
+        numpy.reshape(axis.get_xlim(), (-1, 1)),
+    ).ravel()
+    span = view[1] - view[0]
+    limits = transform.inverted().transform(
+        numpy.reshape((view[0] - span, view[1] + span), (-1, 1)),
+    ).ravel()
+    start = max(numpy.searchsorted(xdata, limits.min()) - 1, 0)
+    stop = numpy.searchsorted(xdata, limits.max(), side="right") + 1
+    indices = slice(start, stop)
+    width = axis.bbox.width
+    if len(xdata[indices]) >= 3 * _DECIMATION_THRESHOLD * width:
+        # Use display coordinates to align columns with the pixel grid
+        columns = axis.bbox.x0 + width / span * (
+            transform.transform(xdata[indices].reshape(-1, 1)).ravel()
+            - view[0]
+        )
+        if numpy.isfinite(columns).all():
+            columns = numpy.floor(columns)
+            indices = start + numpy.unique(numpy.concatenate([
+                _decimate(values[indices], columns) for values in ydata
+            ]))
+    return indices, (limits.min(), limits.max(), span, width)
+
+
+def _is_view_covered(axis, covered_view: tuple) -> bool:
+    """Whether data decimated for covered_view is detailed enough to draw."""
+    if covered_view is None:
+        return True
+    x_min, x_max, span, width = covered_view
+    transform = axis.get_xaxis().get_transform()
+    view = transform.transform(
+        numpy.reshape(axis.get_xlim(), (-1, 1)),
+    ).ravel()
+    limits = sorted(axis.get_xlim())
+    # Zooming in far enough requires more detail
+    return not (
+        limits[0] < x_min or limits[1] > x_max
+        or abs(view[1] - view[0]) < abs(span) / 2
+        or width != axis.bbox.width
+    )
+
+
+def _get_fill_polygons(
+    xdata: numpy.ndarray,
+    ydata1: numpy.ndarray,
+    ydata2: numpy.ndarray,
+) -> list:
+    """
+    Get the polygons filling the area between two curves.
+
+    Like `fill_between`, a separate polygon is created for every range of
+    finite values.
+    """
+    finite = numpy.isfinite(xdata) & numpy.isfinite(ydata1) \
+        & numpy.isfinite(ydata2)
+    bounds = numpy.flatnonzero(
+        numpy.diff(numpy.concatenate(([0], finite.view(numpy.int8), [0]))),
+    )
+    polygons = []
+    for start, stop in bounds.reshape(-1, 2):
+        x, y1, y2 = xdata[start:stop], ydata1[start:stop], ydata2[start:stop]
+        polygons.append(numpy.concatenate((
+            [(x[0], y2[0])],
+            numpy.column_stack((x, y1)),
+            [(x[-1], y2[-1])],
+            numpy.column_stack((x[::-1], y2[::-1])),
+        )))
+    return polygons
+
+
 class ItemArtistWrapper(GObject.Object):
     """Wrapper for base Item."""
 
     __gtype_name__ = "GraphsItemArtistWrapper"
     legend = False
 
+    def __init__(self):
+        super().__init__()
+        self._bindings = []
+        self._connections = []
+
     def get_artist(self) -> artist:
         """Get underlying mpl artist."""
         return self._artist
 
+    def remove(self) -> None:
+        """Remove the artist and stop following the item and canvas."""
+        for binding in self._bindings:
+            binding.unbind()
+        for source, handler_id in self._connections:
+            source.disconnect(handler_id)
+        self._bindings, self._connections = [], []
+        self._artist.remove()
+
+    def _connect(self, source, signal: str, callback) -> None:
+        """Connect to a signal of source until the wrapper is removed."""
+        self._connections.append((source, source.connect(signal, callback)))
+
     @GObject.Property(type=str, default="")
     def name(self) -> str:
         """Get name/label property."""
@@ -94,24 +229,27 @@ class DataItemArtistWrapper(ItemArtistWrapper):
     legend = True
 
     @GObject.Property
-    def xdata(self) -> list:
+    def xdata(self) -> numpy.ndarray:
         """Get xdata property."""
-        return self._artist.get_xdata()
+        return self._xdata
 
     @xdata.setter
-    def xdata(self, xdata: list) -> None:
+    def xdata(self, xdata: numpy.ndarray) -> None:
         """Set xdata property."""
-        self._artist.set_xdata(xdata)
+        self._xdata = numpy.asarray(xdata, dtype=float)
+        self._sorted = bool(numpy.all(self._xdata[1:] >= self._xdata[:-1]))
+        self._update_data()
 
     @GObject.Property
-    def ydata(self) -> list:
+    def ydata(self) -> numpy.ndarray:
         """Get ydata property."""
-        return self._artist.get_ydata()
+        return self._ydata
 
     @ydata.setter
-    def ydata(self, ydata: list) -> None:
+    def ydata(self, ydata: numpy.ndarray) -> None:
         """Set ydata property."""
-        self._artist.set_ydata(ydata)
+        self._ydata = numpy.asarray(ydata, dtype=float)
+        self._update_data()
 
     @GObject.Property(type=int, default=1)
     def linestyle(self) -> int:
@@ -132,6 +270,41 @@ class DataItemArtistWrapper(ItemArtistWrapper):
     def markerstyle(self, markerstyle: int) -> None:
         """Set markerstyle property."""
         self._artist.set_marker(misc.MARKERSTYLES[markerstyle])
+        self._update_data()
+
+    def set_full_resolution(self, full_resolution: bool) -> None:
+        """Set whether to draw all points, used for exporting."""
+        self._full_resolution = full_resolution
+        self._update_data()
+
+    def _update_data(self, *_args) -> None:
+        """
+        Update the drawn data for the current view.
+
+        Large sorted datasets drawn as lines are decimated to the points needed
+        for the pixel columns of the axis. To keep panning smooth, the
+        decimated range extends one view width beyond both sides of the view.
+        """
+        if self._artist.axes is None:  # Artist has been removed
+            return
+        xdata, ydata = self._xdata, self._ydata
+        self._covered_view = None
+        if self._full_resolution or not self._sorted \
+                or len(xdata) != len(ydata) \
+                or self._artist.get_marker() != "none" \
+                or len(xdata) < _DECIMATION_THRESHOLD * self._axis.bbox.width:
+            self._artist.set_data(xdata, ydata)
+            return
+        indices, self._covered_view = _get_view_indices(
+            self._axis, xdata, ydata,
+        )
+        self._artist.set_data(xdata[indices], ydata[indices])
+
+    def _on_xlim_changed(self, _axis) -> None:
+        """Update the drawn data if the view is no longer covered."""
+        if self._artist.axes is not None \
+                and not _is_view_covered(self._axis, self._covered_view):
+            self._update_data()
 
     def _set_properties(self, _x, _y) -> None:
         linewidth, markersize = self.props.linewidth, self.props.markersize
@@ -143,9 +316,14 @@ class DataItemArtistWrapper(ItemArtistWrapper):
 
     def __init__(self, axis: pyplot.axis, item: Graphs.Item):
         super().__init__()
+        self._axis = axis
+        self._full_resolution = False
+        self._covered_view = None
+        self._xdata = self._ydata = numpy.empty(0)
+        self._sorted = True
         self._artist = axis.plot(
-            item.props.xdata,
-            item.props.ydata,
+            [],
+            [],
             label=Graphs.tools_shorten_label(item.get_name(), 40),
             color=item.get_color(),
             alpha=item.get_alpha(),
@@ -156,6 +334,12 @@ class DataItemArtistWrapper(ItemArtistWrapper):
             self.set_property(prop, item.get_property(prop))
             self.connect(f"notify::{prop}", self._set_properties)
         self._set_properties(None, None)
+        self._ydata = numpy.asarray(item.props.ydata, dtype=float)
+        self.props.xdata = item.props.xdata
+        canvas = axis.figure.canvas
+        self._connect(canvas, "view_changed", self._update_data)
+        self._connect(canvas, "resize", self._update_data)
+        self._connect(axis.callbacks, "xlim_changed", self._on_xlim_changed)
 
 
 class EquationItemArtistWrapper(ItemArtistWrapper):
@@ -169,10 +353,11 @@ class EquationItemArtistWrapper(ItemArtistWrapper):
     def __init__(self, axis: pyplot.axis, item: Graphs.Item):
         super().__init__()
 
-        self._equation = utilities.preprocess(item.props.equation)
+        self._equation = item.props.equation
         self._axis = axis
-        self._axis.figure.canvas.connect("view_changed", self._generate_data)
-        self._axis.figure.canvas.connect("view_action", self._generate_data)
+        canvas = self._axis.figure.canvas
+        self._connect(canvas, "view_changed", self._generate_data)
+        self._connect(canvas, "view_action", self._generate_data)
         self._artist = axis.plot(
             [],
             [],
@@ -194,7 +379,7 @@ class EquationItemArtistWrapper(ItemArtistWrapper):
 
     @equation.setter
     def equation(self, equation: str) -> None:
-        self._equation = utilities.preprocess(equation)
+        self._equation = equation
         self._generate_data()
 
     @GObject.Property(type=int, default=1)
@@ -214,11 +399,33 @@ class EquationItemArtistWrapper(ItemArtistWrapper):
         self._artist.set_linewidth(linewidth)
 
     def _generate_data(self, _axis=None):
-        """Generate new data for the artist."""
+        """
+        Generate new data for the artist.
+
+        Data is generated for one view width beyond both sides of the view,
+        unless that could cross zero on the current scale.
+        """
         x_start, x_stop = self._axis.get_xlim()
-        x_range = x_stop - x_start
-        limits = (x_start - x_range, x_stop + x_range)
-        xdata, ydata = utilities.equation_to_data(self._equation, limits)
+        scale = scales.Scale.from_string(self._axis.get_xscale())
+        width = self._axis.bbox.width
+        if scale in (scales.Scale.SQUAREROOT, scales.Scale.INVERSE):
+            limits = (x_start, x_stop)
+        else:
+            limits = tuple(
+                utilities.get_value_at_fraction(
+                    fraction, x_start, x_stop, scale.value,
+                ) for fraction in (-1, 2)
+            )
+            width *= 3
+        xdata, ydata = utilities.equation_to_data(
+            self._equation,
+            limits,
+            steps=None,
+            scale=scale.value,
+            y_limits=self._axis.get_ylim(),
+            y_scale=scales.Scale.from_string(self._axis.get_yscale()).value,
+            size=(width, self._axis.bbox.height),
+        )
         self._artist.set_data(xdata, ydata)
         canvas = self._axis.figure.canvas
         canvas.queue_draw()
@@ -305,14 +512,57 @@ class FillItemArtistWrapper(ItemArtistWrapper):
 
     @data.setter
     def data(self, data) -> None:
-        dummy = Figure().add_subplot().fill_between(*data)
-        self._artist.set_paths([dummy.get_paths()[0].vertices])
+        if any(values is None for values in data):
+            data = (numpy.empty(0),) * 3
+        self._data = numpy.asarray(data, dtype=float)
+        xdata = self._data[0]
+        self._sorted = bool(numpy.all(xdata[1:] >= xdata[:-1]))
+        self._update_data()
+
+    def set_full_resolution(self, full_resolution: bool) -> None:
+        """Set whether to draw all points, used for exporting."""
+        self._full_resolution = full_resolution
+        self._update_data()
+
+    def _update_data(self, *_args) -> None:
+        """
+        Update the drawn polygons for the current view.
+
+        Long bands with sorted x-values are decimated like data items.
+        """
+        if self._artist.axes is None:  # Artist has been removed
+            return
+        xdata, ydata1, ydata2 = self._data
+        self._covered_view = None
+        if not (self._full_resolution or not self._sorted
+                or len(xdata) < _DECIMATION_THRESHOLD * self._axis.bbox.width):
+            indices, self._covered_view = _get_view_indices(
+                self._axis, xdata, ydata1, ydata2,
+            )
+            xdata, ydata1, ydata2 = self._data[:, indices]
+        self._artist.set_verts(_get_fill_polygons(xdata, ydata1, ydata2))
+
+    def _on_xlim_changed(self, _axis) -> None:
+        """Update the drawn polygons if the view is no longer covered."""
+        if self._artist.axes is not None \
+                and not _is_view_covered(self._axis, self._covered_view):
+            self._update_data()
 
     def __init__(self, axis: pyplot.axis, item: Graphs.Item):
         super().__init__()
+        self._axis = axis
+        self._full_resolution = False
+        self._covered_view = None
         self._artist = axis.fill_between(
-            *item.props.data,
+            [],
+            [],
+            [],
             label=Graphs.tools_shorten_label(item.get_name(), 40),
             color=item.get_color(),
             alpha=item.get_alpha(),
         )
+        self.props.data = item.props.data
+        canvas = axis.figure.canvas
+        self._connect(canvas, "view_changed", self._update_data)
+        self._connect(canvas, "resize", self._update_data)
+        self._connect(axis.callbacks, "xlim_changed", self._on_xlim_changed)
@@ -0,0 +1,562 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+Headless batch processing.
+
+Import files, apply a chain of data operations and export the results
+without creating any widgets. Files are processed in parallel in a process
+pool. Available from the command line as `graphs --batch`.
+
+    Functions:
+        get_settings
+        parse_operation
+        process_file
+        process_files
+        get_figure_settings
+        get_color_cycle
+        get_project_dict
+        main
+"""
+import argparse
+import concurrent.futures
+import functools
+import logging
+import multiprocessing
+import os
+from gettext import gettext as _
+
+import gi
+from gi.repository import GLib, Gio, Graphs
+
+from graphs import export_items, file_import, misc, parse_file, project
+from graphs import item, style_io, utilities
+from graphs.item import DataItem
+from graphs.operations import DataHelper, DataOperations
+
+from matplotlib import RcParams
+
+import numpy
+
+_APPLICATION_ID = "se.sjoerd.Graphs"
+
+# Style used for imported items, equal to the defaults of DataItem
+_STYLE = {
+    "lines.linestyle": "solid",
+    "lines.linewidth": 3,
+    "lines.marker": "none",
+    "lines.markersize": 7,
+}
+
+OPERATIONS = [
+    "translate_x",
+    "translate_y",
+    "multiply_x",
+    "multiply_y",
+    "normalize",
+    "smoothen",
+    "center",
+    "derivative",
+    "integral",
+    "fft",
+    "inverse_fft",
+    "transform",
+]
+
+EXPORT_FORMATS = ["columns", "npy", "multicolumn", "npz", "project"]
+# Formats with a file per item, and the suffix of those files
+_SEPARATE_FORMATS = {"columns": ".txt", "npy": ".npy"}
+
+# Default limits of the figure settings, ordered as misc.LIMITS
+_DEFAULT_LIMITS = [0, 1, 0, 1, 0, 10, 0, 10]
+_STYLE_URI = "resource:///se/sjoerd/Graphs/styles/"
+# The light system style, batch processing does not follow the desktop
+_SYSTEM_STYLE = "Adwaita"
+
+
+class BatchError(Exception):
+    """Custom Error for failed batch processing."""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+def get_settings(
+    application_id: str = _APPLICATION_ID,
+    values: dict = None,
+) -> Gio.Settings:
+    """
+    Get the application settings without the configuration of the user.
+
+    Settings are stored in memory and start at their defaults. Values are
+    given as {"import-params.columns.column-y": 2} and may be strings, which
+    are parsed according to the type of the key.
+    """
+    schema = Gio.SettingsSchemaSource.get_default().lookup(
+        application_id, True,
+    )
+    if schema is None:
+        raise BatchError(
+            _("Settings schema {id} is not installed").format(
+                id=application_id,
+            ),
+        )
+    settings = Gio.Settings.new_full(
+        schema, Gio.memory_settings_backend_new(), None,
+    )
+    for path, value in (values or {}).items():
+        *children, key = path.split(".")
+        settings_child = settings
+        for child in children:
+            if child not in settings_child.list_children():
+                raise BatchError(_("Unknown setting {key}").format(key=path))
+            settings_child = settings_child.get_child(child)
+        _set_value(settings_child, key, value, path)
+    return settings
+
+
+def _set_value(settings: Gio.Settings, key: str, value, path: str) -> None:
+    schema = settings.props.settings_schema
+    if not schema.has_key(key):
+        raise BatchError(_("Unknown setting {key}").format(key=path))
+    schema_key = schema.get_key(key)
+    value_type = schema_key.get_value_type()
+    try:
+        if isinstance(value, str) and value_type.dup_string() != "s":
+            variant = GLib.Variant.parse(value_type, value, None, None)
+        else:
+            variant = GLib.Variant(value_type.dup_string(), value)
+    except (GLib.Error, TypeError, ValueError) as error:
+        raise BatchError(
+            _("Invalid value for setting {key}").format(key=path),
+        ) from error
+    if not schema_key.range_check(variant):
+        raise BatchError(
+            _("Invalid value for setting {key}").format(key=path),
+        )
+    settings.set_value(key, variant)
+
+
+def parse_operation(string: str) -> tuple:
+    """
+    Parse an operation given as name:argument:argument.
+
+    For example "smoothen:moving-average", "translate_x:5" or
+    "transform:x:y*2".
+    """
+    name, *args = string.split(":")
+    if name not in OPERATIONS:
+        raise BatchError(_("Unknown operation {name}").format(name=name))
+    return (name, *args)
+
+
+def _get_operation_args(
+    name: str,
+    args: list,
+    actions_settings: Gio.Settings,
+) -> list:
+    """Get the arguments of an operation, like `perform_operation` does."""
+    if name in ("center", "smoothen"):
+        if args:
+            _set_value(actions_settings, name, str(args[0]), name)
+        args = [actions_settings.get_enum(name)]
+        if name == "smoothen":
+            args.append(actions_settings.get_child(name))
+        return args
+    if "translate" in name or "multiply" in name:
+        if len(args) != 1:
+            raise BatchError(
+                _("{name} requires a value").format(name=name),
+            )
+        value = args[0]
+        if isinstance(value, str):
+            try:
+                value = utilities.string_to_float(value)
+            except ValueError as error:
+                raise BatchError(str(error)) from error
+        return [value]
+    if name == "transform":
+        if len(args) not in (2, 3):
+            raise BatchError(
+                _("{name} requires an x and y expression").format(name=name),
+            )
+        input_x, input_y, *discard = args
+        discard = bool(discard) and str(discard[0]).lower() in ("1", "true")
+        return [input_x, input_y, discard]
+    return []
+
+
+def process_file(
+    file: Gio.File,
+    operations: list = (),
+    settings: Gio.Settings = None,
+) -> misc.ItemList:
+    """
+    Import a file and apply operations to all of its data items.
+
+    Operations are tuples of the name and its arguments, see
+    `parse_operation`. Import parameters and settings of operations are
+    taken from settings, defaulting to `get_settings()`.
+    """
+    if settings is None:
+        settings = get_settings()
+    mode = file_import.guess_import_mode(file)
+    callback = getattr(parse_file, "import_from_" + mode)
+    import_settings = settings.get_child("import-params")
+    params = import_settings.get_child(mode) \
+        if mode in import_settings.list_children() else None
+    items = callback(params, _STYLE, file)
+    actions_settings = settings.get_child("actions")
+    for name, *args in operations:
+        args = _get_operation_args(name, args, actions_settings)
+        for item_ in items:
+            if not isinstance(item_, DataItem):
+                continue
+            selection = DataHelper.get_xydata(0, None, item_)
+            result = DataOperations.compute(item_, selection, name, *args)
+            success, message = \
+                DataOperations.apply(item_, selection, result, 0)
+            if not success:
+                raise BatchError(f"{item_.get_name()}: {message}")
+    return items
+
+
+def _export_separately(
+    items: misc.ItemList,
+    directory: Gio.File,
+    export_format: str,
+) -> None:
+    """Save each item in its own file in directory."""
+    suffix = _SEPARATE_FORMATS[export_format]
+    for item_ in items:
+        file = directory.get_child_for_display_name(item_.get_name() + suffix)
+        export_items.export_items(export_format, file, [item_], None)
+
+
+def _process_path(
+    path: str,
+    operations: list,
+    output: str,
+    export_format: str,
+    application_id: str,
+    settings_values: dict,
+) -> tuple:
+    """
+    Process a single file in a worker process.
+
+    Returns the path, the item dicts if they need to be collected and an
+    error message if processing failed.
+    """
+    file = Gio.File.new_for_path(path)
+    try:
+        items = process_file(
+            file, operations, get_settings(application_id, settings_values),
+        )
+        items = [item_ for item_ in items if isinstance(item_, DataItem)]
+        if export_format in _SEPARATE_FORMATS:
+            _export_separately(
+                items, Gio.File.new_for_path(output), export_format,
+            )
+            return path, None, None
+        return path, [item_.to_dict() for item_ in items], None
+    except (
+        misc.ParseError, project.ProjectParseError, BatchError,
+    ) as error:
+        return path, None, error.message
+    except (GLib.Error, OSError, ValueError) as error:
+        return path, None, str(error)
+    # A malformed file must not abort processing the other files
+    except Exception as error:  # noqa: PIE786
+        return path, None, f"{type(error).__name__}: {error}"
+
+
+def process_files(
+    paths: list[str],
+    output: str,
+    operations: list = (),
+    export_format: str = "columns",
+    application_id: str = _APPLICATION_ID,
+    settings_values: dict = None,
+    jobs: int = None,
+    version: str = "",
+) -> list[tuple[str, str]]:
+    """
+    Process many files in parallel.
+
+    With the columns and npy formats, every data item is written to its own
+    file in the output directory. With the other formats, all data items are
+    collected in a single output file. Settings values are passed to
+    `get_settings`. Returns the path and error message of each failed file.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise BatchError(
+            _("Unknown format {format}").format(format=export_format),
+        )
+    # Check settings and operations before starting any workers
+    settings = get_settings(application_id, settings_values)
+    operations = [
+        parse_operation(operation) if isinstance(operation, str)
+        else tuple(operation) for operation in operations
+    ]
+    for name, *args in operations:
+        _get_operation_args(name, args, settings.get_child("actions"))
+    if export_format in _SEPARATE_FORMATS:
+        directory = Gio.File.new_for_path(output)
+        if not directory.query_exists(None):
+            directory.make_directory_with_parents(None)
+
+    failures = []
+    item_dicts = []
+    jobs = jobs or os.cpu_count() or 1
+    # Spawn workers, forked GObject state is not safe to reuse. Workers do not
+    # run the launcher, so the version of Graphs is required there.
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=gi.require_version,
+        initargs=("Graphs", "1"),
+    ) as executor:
+        results = executor.map(
+            functools.partial(
+                _process_path,
+                operations=operations,
+                output=output,
+                export_format=export_format,
+                application_id=application_id,
+                settings_values=settings_values,
+            ),
+            paths,
+            chunksize=max(1, min(64, len(paths) // (4 * jobs))),
+        )
+        for path, dicts, message in results:
+            if message is not None:
+                logging.warning("%s: %s", path, message)
+                failures.append((path, message))
+                continue
+            logging.debug("Processed %s", path)
+            if dicts:
+                item_dicts.extend(dicts)
+
+    if export_format == "project":
+        figure_settings = get_figure_settings(settings)
+        project.save_project_dict(
+            Gio.File.new_for_path(output),
+            get_project_dict(
+                item_dicts,
+                figure_settings,
+                get_color_cycle(figure_settings),
+                version,
+            ),
+        )
+    elif export_format not in _SEPARATE_FORMATS and item_dicts:
+        export_items.export_items(
+            export_format,
+            Gio.File.new_for_path(output),
+            list(map(item.new_from_dict, item_dicts)),
+            None,
+        )
+    return failures
+
+
+def get_figure_settings(settings: Gio.Settings) -> dict:
+    """Get all figure settings as stored in a project."""
+    figure_settings = Graphs.FigureSettings.new(settings.get_child("figure"))
+    return {
+        key: figure_settings.get_property(key)
+        for key in dir(figure_settings.props)
+    }
+
+
+def _parse_style(name: str, validate: RcParams = None) -> RcParams:
+    """Parse a bundled style, returns None if it does not exist."""
+    name = name.replace("(", "").replace(")", "")
+    file = Gio.File.new_for_uri(
+        _STYLE_URI + name.lower().replace(" ", "-") + ".mplstyle",
+    )
+    if not file.query_exists(None):
+        return None
+    return style_io.parse(file, validate)[0]
+
+
+def get_color_cycle(figure_settings: dict) -> list[str]:
+    """
+    Get the line colors of the style used by figure_settings.
+
+    Custom styles of the user are not available in batch processing, unknown
+    styles fall back to the system style like in the application.
+    """
+    style = _parse_style(_SYSTEM_STYLE)
+    if figure_settings["use_custom_style"]:
+        custom_style = _parse_style(figure_settings["custom_style"], style)
+        if custom_style is not None:
+            style = custom_style
+        else:
+            logging.warning(
+                _("Plot style {stylename} does not exist, using {system}")
+                .format(
+                    stylename=figure_settings["custom_style"],
+                    system=_SYSTEM_STYLE,
+                ),
+            )
+    return style["axes.prop_cycle"].by_key()["color"]
+
+
+def _assign_colors(item_dicts: list[dict], color_cycle: list[str]) -> None:
+    """Give items without a color the next unused color of the cycle."""
+    used_colors = [
+        item_dict["color"] for item_dict in item_dicts
+        if item_dict.get("color") in color_cycle
+    ]
+    for item_dict in item_dicts:
+        if item_dict.get("color", ""):
+            continue
+        if all(color in used_colors for color in color_cycle):
+            used_colors.clear()
+        color = next(
+            color for color in color_cycle if color not in used_colors
+        )
+        item_dict["color"] = color
+        used_colors.append(color)
+
+
+def get_project_dict(
+    item_dicts: list[dict],
+    figure_settings: dict,
+    color_cycle: list[str],
+    version: str = "",
+) -> dict:
+    """
+    Get a project dict for items, with limits fitting all data.
+
+    Items without a color are assigned one from color_cycle, in the same way
+    as items added in the application.
+    """
+    _assign_colors(item_dicts, color_cycle)
+    limits = [figure_settings.get(key, default)
+              for key, default in zip(misc.LIMITS, _DEFAULT_LIMITS)]
+    used = [False] * 4
+    for item_dict in item_dicts:
+        for index, key in (
+            (item_dict.get("xposition", 0), "xdata"),
+            (2 + item_dict.get("yposition", 0), "ydata"),
+        ):
+            data = numpy.asarray(item_dict[key])
+            data = data[numpy.isfinite(data)]
+            if len(data) == 0:
+                continue
+            min_value, max_value = data.min(), data.max()
+            if used[index]:
+                min_value = min(min_value, limits[2 * index])
+                max_value = max(max_value, limits[2 * index + 1])
+            used[index] = True
+            limits[2 * index] = float(min_value)
+            limits[2 * index + 1] = float(max_value)
+    for index in range(4):
+        if not used[index]:
+            continue
+        # Same padding as the automatic limits of linear axes
+        span = limits[2 * index + 1] - limits[2 * index]
+        padding = (0.05 if index > 1 else 0.015) * span
+        limits[2 * index] -= padding
+        limits[2 * index + 1] += padding
+    return {
+        "version": version,
+        "data": item_dicts,
+        "figure-settings": figure_settings | dict(zip(misc.LIMITS, limits)),
+        "history-states": [([], limits)],
+        "history-position": -1,
+        "view-history-states": [limits],
+        "view-history-position": -1,
+    }
+
+
+def _get_paths(inputs: list[str]) -> list[str]:
+    """Expand directories to the files they contain."""
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if os.path.isfile(os.path.join(path, name))
+            )
+        else:
+            paths.append(path)
+    return paths
+
+
+def main(
+    argv: list[str],
+    application_id: str = _APPLICATION_ID,
+    version: str = "",
+) -> int:
+    """Run batch processing from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="graphs --batch",
+        description=_(
+            "Import files, apply operations and export the results "
+            "without opening a window.",
+        ),
+    )
+    parser.add_argument(
+        "inputs", nargs="+", metavar="PATH",
+        help=_("files or directories to import"),
+    )
+    parser.add_argument(
+        "-o", "--output", required=True,
+        help=_(
+            "output directory for the columns and npy formats, "
+            "otherwise the output file",
+        ),
+    )
+    parser.add_argument(
+        "-f", "--format", choices=EXPORT_FORMATS, default="columns",
+        help=_("export format"),
+    )
+    parser.add_argument(
+        "-p", "--operation", action="append", default=[],
+        metavar="NAME[:ARG...]",
+        help=_("operation to apply, may be given multiple times: {names}")
+        .format(names=", ".join(OPERATIONS)),
+    )
+    parser.add_argument(
+        "-s", "--set", action="append", default=[], metavar="KEY=VALUE",
+        help=_(
+            "change a setting, for example "
+            "import-params.columns.delimiter=comma",
+        ),
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None,
+        help=_("amount of worker processes"),
+    )
+    args = parser.parse_args(argv)
+
+    settings_values = {}
+    for setting in args.set:
+        key, separator, value = setting.partition("=")
+        if not separator:
+            parser.error(_("Invalid setting {setting}").format(
+                setting=setting,
+            ))
+        settings_values[key] = value
+
+    paths = _get_paths(args.inputs)
+    try:
+        failures = process_files(
+            paths,
+            args.output,
+            args.operation,
+            args.format,
+            application_id,
+            settings_values,
+            args.jobs,
+            version,
+        )
+    except BatchError as error:
+        logging.error(error.message)
+        return 2
+    logging.info(
+        _("Processed {amount} of {total} files").format(
+            amount=len(paths) - len(failures), total=len(paths),
+        ),
+    )
+    return 1 if failures else 0
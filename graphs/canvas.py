@@ -9,13 +9,16 @@ interactive navigation in conjunction with graphs-specific structures.
     Classes:
         Canvas
 """
+import logging
 import math
 
-from gi.repository import Adw, GObject, Gdk, Gio, Graphs, Gtk
+import cairo
+
+from gi.repository import Adw, GLib, GObject, Gdk, Gio, Graphs, Gtk
 
 import gio_pyio
 
-from graphs import artist, misc, scales, utilities
+from graphs import artist, misc, profiling, scales, utilities
 
 from matplotlib import backend_tools as tools, pyplot
 from matplotlib.backend_bases import (
@@ -103,6 +106,11 @@ class Canvas(Graphs.Canvas, FigureCanvas):
             items=items,
         )
         self._idle_draw_id = 0
+        self._pending_limits = {}
+        self._legend_outdated = False
+        self._tick_id = 0
+        self._requests = {"draw": 0, "legend": 0, "limits": 0}
+        self._blit = None
         self.set_draw_func(self._draw_func)
         self.connect("resize", self.resize_event)
         self.connect("notify::scale-factor", self._update_device_pixel_ratio)
@@ -122,7 +130,17 @@ class Canvas(Graphs.Canvas, FigureCanvas):
         self._legend = True
         self._legend_position = misc.LEGEND_POSITIONS[0]
         self._handles = []
+        # uuid: (item, artist wrapper)
+        self._artists = {}
+        self._axes_layout = None
         self._rubberband_rect = None
+        # direction: (axes, whether the limits are x-limits)
+        self._limit_axes = {
+            "bottom": ((self._axis, self._right_axis), True),
+            "left": ((self._axis, self._top_left_axis), False),
+            "top": ((self._top_left_axis, self._top_right_axis), True),
+            "right": ((self._right_axis, self._top_right_axis), False),
+        }
 
         # Handle stuff only used if the canvas is interactive
         if interactive:
@@ -134,6 +152,9 @@ class Canvas(Graphs.Canvas, FigureCanvas):
             lambda _self, factor: self.zoom(factor, False),
         )
 
+        # Connected before the artists, which read the limits on view changes
+        for signal in ("view_changed", "view_action"):
+            self.connect(signal, lambda _canvas: self._apply_updates())
         self.connect("notify::hide-unselected", self._redraw)
         items.connect("items-changed", self._redraw)
         if isinstance(items, Gtk.SelectionModel):
@@ -248,6 +269,7 @@ class Canvas(Graphs.Canvas, FigureCanvas):
         dy: float,
     ) -> None:
         """Handle scroll event."""
+        self._apply_updates()
         if self._ctrl_held:
             self.zoom(1 / _SCROLL_SCALE if dy > 0 else _SCROLL_SCALE)
         else:
@@ -338,6 +360,7 @@ class Canvas(Graphs.Canvas, FigureCanvas):
 
         Update all axes' limits in respect to the current mouse position.
         """
+        self._apply_updates()
         if not respect_mouse:
             self._xfrac, self._yfrac = 0.5, 0.5
         if self._xfrac is None or self._yfrac is None:
@@ -438,7 +461,15 @@ class Canvas(Graphs.Canvas, FigureCanvas):
             value1, value2 = value2, value1
         return value1, value2
 
+    @profiling.timed()
     def _redraw(self, *_args) -> None:
+        """
+        Reconcile the artists with the drawn items.
+
+        Only artists of added or removed items, or items that moved to another
+        axis, are created or removed. The axes are only set up again when the
+        used axes change.
+        """
         # bottom, top, left, right
         used_axes = [False, False, False, False]
         visible_axes = [False, False, False, False]
@@ -450,18 +481,49 @@ class Canvas(Graphs.Canvas, FigureCanvas):
             visible_axes[xposition] = True
             visible_axes[2 + yposition] = True
             used_axes[xposition + 2 * yposition] = True
+        if not any(visible_axes):
+            visible_axes = [True, False, True, False]  # Left and bottom
+            used_axes = [True, False, False, False]  # self.axis visible
+        axes_layout = (used_axes, visible_axes)
+        if axes_layout != self._axes_layout:
+            self._axes_layout = axes_layout
+            self._setup_axes(used_axes, visible_axes)
+
+        artists = {}
+        for item in drawable_items:
+            uuid = item.get_uuid()
+            drawn_item, wrapper = self._artists.pop(uuid, (None, None))
+            axis = self.axes[item.get_yposition() * 2 + item.get_xposition()]
+            if drawn_item is not item or wrapper.get_artist().axes is not axis:
+                if wrapper is not None:
+                    wrapper.remove()
+                wrapper = artist.new_for_item(self, item)
+            artists[uuid] = (item, wrapper)
+        for _item, wrapper in self._artists.values():
+            wrapper.remove()
+        self._artists = artists
+
+        # Earlier items are drawn on top, without changing the order of
+        # artist types
+        self._handles = [
+            artists[item.get_uuid()][1] for item in reversed(drawable_items)
+        ]
+        for index, handle in enumerate(self._handles):
+            artist_ = handle.get_artist()
+            artist_.set_zorder(
+                type(artist_).zorder + index / len(self._handles),
+            )
+        self.update_legend()
+
+    def _setup_axes(self, used_axes: list, visible_axes: list) -> None:
+        """Set visibility, ticks and spines of the axes."""
         axes_directions = (
             ("bottom", "left"),  # axis
             ("top", "left"),  # top_left_axis
             ("bottom", "right"),  # right_axis
             ("top", "right"),  # top_right_axis
         )
-
-        if not any(visible_axes):
-            visible_axes = (True, False, True, False)  # Left and bottom
-            used_axes = (True, False, False, False)  # self.axis visible
-            self._legend_axis = self._axis
-
+        self._legend_axis = self._axis
         params = self._style_params
         draw_frame = params["axes.spines.bottom"]
         ticks = "both" if params["xtick.minor.visible"] else "major"
@@ -487,8 +549,6 @@ class Canvas(Graphs.Canvas, FigureCanvas):
                         direction in enumerate(misc.DIRECTIONS)
                     },
                 )
-            for handle in axis.lines + axis.texts:
-                handle.remove()
             axis_legend = axis.get_legend()
             if axis_legend is not None:
                 axis_legend.remove()
@@ -504,16 +564,166 @@ class Canvas(Graphs.Canvas, FigureCanvas):
         self._axis.get_yaxis().set_visible(visible_axes[2])
         self._right_axis.get_yaxis().set_visible(visible_axes[3])
 
-        self._handles = [
-            artist.new_for_item(self, item)
-            for item in reversed(drawable_items)
-        ]
-        self.update_legend()
-
     def _on_pick(self, event) -> None:
         """Emit edit-request signal for picked label/title."""
         self.emit("edit_request", event.artist.id)
 
+    # Overwritten function - do not change name
+    def on_draw_event(self, widget, ctx) -> None:
+        """Render the figure, timed when profiling is enabled."""
+        self._apply_updates()
+        if self._blit is not None:
+            with profiling.section("Canvas.blit"):
+                self._draw_blit(ctx)
+        else:
+            with profiling.section("Canvas.draw"):
+                super().on_draw_event(widget, ctx)
+        logging.debug(
+            "Canvas drawn for %(draw)d draw, %(legend)d legend and "
+            "%(limits)d limit requests",
+            self._requests,
+        )
+        self._requests = dict.fromkeys(self._requests, 0)
+
+    def queue_draw(self) -> None:
+        """Queue a draw, GTK draws at most once per frame."""
+        self._requests["draw"] += 1
+        super().queue_draw()
+
+    def _start_blit(self, overlay: tuple = (), pan_axis=None) -> None:
+        """
+        Cache a rendering of the static artists for the duration of a drag.
+
+        Until `_stop_blit`, frames only composite the cached background with
+        the overlay artists. If pan_axis is given, the item artists are cached
+        as separate layer that is moved along with the limits of pan_axis.
+        """
+        if self._blit is not None or self.get_width() <= 0 \
+                or self.get_height() <= 0:
+            return
+        self._apply_updates()
+        overlay = list(overlay)
+        layer_artists = []
+        if pan_axis is not None:
+            layer_artists = [handle.get_artist() for handle in self._handles]
+            legend = self._legend_axis.get_legend()
+            if legend is not None:
+                overlay.append(legend)
+        # Animated artists are skipped when drawing the figure
+        for artist_ in overlay + layer_artists:
+            artist_.set_animated(True)
+        blit = _Blit(
+            self._render_surface([self.figure]), overlay, layer_artists,
+        )
+        if pan_axis is not None:
+            blit.layer = self._render_surface(layer_artists)
+            blit.axis = pan_axis
+            blit.origin = pan_axis.bbox.get_points().mean(axis=0)
+            blit.reference = pan_axis.transData.inverted().transform(
+                blit.origin,
+            )
+        self._blit = blit
+
+    def _stop_blit(self) -> None:
+        """Stop compositing cached renderings and draw the full figure."""
+        if self._blit is None:
+            return
+        for artist_ in self._blit.overlay + self._blit.layer_artists:
+            artist_.set_animated(False)
+        self._blit = None
+        self.queue_draw()
+
+    def _render_surface(self, artists: list) -> cairo.ImageSurface:
+        """Render artists to a surface the size of the canvas."""
+        width, height = self.get_width(), self.get_height()
+        scale = self.get_scale_factor()
+        surface = cairo.ImageSurface(
+            cairo.FORMAT_ARGB32, width * scale, height * scale,
+        )
+        surface.set_device_scale(scale, scale)
+        self._renderer.set_context(cairo.Context(surface))
+        # Draw in logical pixels, like the canvas itself
+        self._renderer.width, self._renderer.height = width, height
+        for artist_ in artists:
+            artist_.draw(self._renderer)
+        return surface
+
+    def _draw_blit(self, ctx) -> None:
+        """Composite the cached renderings and draw the overlay artists."""
+        if self._idle_draw_id:
+            GLib.source_remove(self._idle_draw_id)
+            self._idle_draw_id = 0
+        blit = self._blit
+        allocation = self.get_allocation()
+        Gtk.render_background(
+            self.get_style_context(), ctx,
+            allocation.x, allocation.y, allocation.width, allocation.height,
+        )
+        ctx.set_source_surface(blit.background, 0, 0)
+        ctx.paint()
+        if blit.layer is not None:
+            # Panning moves all data by the same amount of pixels
+            offset = blit.axis.transData.transform(blit.reference) \
+                - blit.origin
+            bbox = blit.axis.bbox
+            ctx.save()
+            ctx.rectangle(
+                bbox.x0, self.get_height() - bbox.y1, bbox.width, bbox.height,
+            )
+            ctx.clip()
+            ctx.set_source_surface(blit.layer, offset[0], -offset[1])
+            ctx.paint()
+            ctx.restore()
+        self._renderer.set_context(ctx)
+        for artist_ in blit.overlay:
+            artist_.draw(self._renderer)
+
+    def _queue_update(self) -> None:
+        """Apply pending updates before the next frame is drawn."""
+        if self._tick_id == 0:
+            self._tick_id = self.add_tick_callback(self._on_tick)
+        self.queue_draw()
+
+    def _on_tick(self, _widget, _frame_clock) -> bool:
+        self._tick_id = 0
+        self._apply_updates()
+        return GLib.SOURCE_REMOVE
+
+    def _apply_updates(self) -> None:
+        """Apply pending limit and legend updates."""
+        if self._pending_limits:
+            limits, self._pending_limits = self._pending_limits, {}
+            for direction, (axes, x) in self._limit_axes.items():
+                min_ = limits.get(f"min_{direction}")
+                max_ = limits.get(f"max_{direction}")
+                if min_ is None and max_ is None:
+                    continue
+                for axis in axes:
+                    if x:
+                        axis.set_xlim(min_, max_)
+                    else:
+                        axis.set_ylim(min_, max_)
+                if direction == "top":
+                    self.highlight.load(self)
+        if self._legend_outdated:
+            self._legend_outdated = False
+            self._update_legend()
+
+    def _get_limit(self, name: str) -> float:
+        """Get a limit, including pending changes."""
+        if name in self._pending_limits:
+            return self._pending_limits[name]
+        bound, direction = name.split("_")
+        axes, x = self._limit_axes[direction]
+        limits = axes[0].get_xlim() if x else axes[0].get_ylim()
+        return limits[bound == "max"]
+
+    def _set_limit(self, name: str, value: float) -> None:
+        """Set a limit, applied at most once per frame."""
+        self._requests["limits"] += 1
+        self._pending_limits[name] = value
+        self._queue_update()
+
     # Overwritten function - do not change name
     def _post_draw(self, _widget, context) -> None:
         """Allow custom rendering extensions."""
@@ -555,7 +765,12 @@ class Canvas(Graphs.Canvas, FigureCanvas):
         ctx.stroke()
 
     def update_legend(self) -> None:
-        """Update the legend or hide if not used."""
+        """Update the legend or hide if not used, at most once per frame."""
+        self._requests["legend"] += 1
+        self._legend_outdated = True
+        self._queue_update()
+
+    def _update_legend(self) -> None:
         if self._legend and self._handles:
             handles = [
                 handle.get_artist() for handle in self._handles
@@ -568,12 +783,10 @@ class Canvas(Graphs.Canvas, FigureCanvas):
                     frameon=True,
                     reverse=True,
                 )
-                self.queue_draw()
                 return
         legend = self._legend_axis.get_legend()
         if legend is not None:
             legend.remove()
-        self.queue_draw()
 
     @staticmethod
     def _save(
@@ -583,13 +796,28 @@ class Canvas(Graphs.Canvas, FigureCanvas):
         dpi: int,
         transparent: bool,
     ) -> None:
-        with gio_pyio.open(file, "wb") as file_like:
-            self.figure.savefig(
-                file_like,
-                format=fmt,
-                dpi=dpi,
-                transparent=transparent,
+        self._apply_updates()
+        # Export all points instead of the decimated on-screen data
+        handles = [
+            handle for handle in self._handles
+            if isinstance(
+                handle,
+                (artist.DataItemArtistWrapper, artist.FillItemArtistWrapper),
             )
+        ]
+        for handle in handles:
+            handle.set_full_resolution(True)
+        try:
+            with gio_pyio.open(file, "wb") as file_like:
+                self.figure.savefig(
+                    file_like,
+                    format=fmt,
+                    dpi=dpi,
+                    transparent=transparent,
+                )
+        finally:
+            for handle in handles:
+                handle.set_full_resolution(False)
 
     def _on_mode_change(self, *_args) -> None:
         highlight_enabled = self.props.mode == 2
@@ -722,92 +950,74 @@ class Canvas(Graphs.Canvas, FigureCanvas):
     @GObject.Property(type=float)
     def min_bottom(self) -> float:
         """Lower limit for the bottom axis."""
-        return self._axis.get_xlim()[0]
+        return self._get_limit("min_bottom")
 
     @min_bottom.setter
     def min_bottom(self, value: float) -> None:
-        for axis in (self._axis, self._right_axis):
-            axis.set_xlim(value, None)
-        self.queue_draw()
+        self._set_limit("min_bottom", value)
 
     @GObject.Property(type=float)
     def max_bottom(self) -> float:
         """Upper limit for the bottom axis."""
-        return self._axis.get_xlim()[1]
+        return self._get_limit("max_bottom")
 
     @max_bottom.setter
     def max_bottom(self, value: float) -> None:
-        for axis in (self._axis, self._right_axis):
-            axis.set_xlim(None, value)
-        self.queue_draw()
+        self._set_limit("max_bottom", value)
 
     @GObject.Property(type=float)
     def min_left(self) -> float:
         """Lower limit for the left axis."""
-        return self._axis.get_ylim()[0]
+        return self._get_limit("min_left")
 
     @min_left.setter
     def min_left(self, value: float) -> None:
-        for axis in (self._axis, self._top_left_axis):
-            axis.set_ylim(value, None)
-        self.queue_draw()
+        self._set_limit("min_left", value)
 
     @GObject.Property(type=float)
     def max_left(self) -> float:
         """Upper limit for the left axis."""
-        return self._axis.get_ylim()[1]
+        return self._get_limit("max_left")
 
     @max_left.setter
     def max_left(self, value: float) -> None:
-        for axis in (self._axis, self._top_left_axis):
-            axis.set_ylim(None, value)
-        self.queue_draw()
+        self._set_limit("max_left", value)
 
     @GObject.Property(type=float)
     def min_top(self) -> float:
         """Lower limit for the top axis."""
-        return self._top_left_axis.get_xlim()[0]
+        return self._get_limit("min_top")
 
     @min_top.setter
     def min_top(self, value: float) -> None:
-        for axis in (self._top_left_axis, self._top_right_axis):
-            axis.set_xlim(value, None)
-        self.highlight.load(self)
-        self.queue_draw()
+        self._set_limit("min_top", value)
 
     @GObject.Property(type=float)
     def max_top(self) -> float:
         """Upper limit for the top axis."""
-        return self._top_left_axis.get_xlim()[1]
+        return self._get_limit("max_top")
 
     @max_top.setter
     def max_top(self, value: float) -> None:
-        for axis in (self._top_left_axis, self._top_right_axis):
-            axis.set_xlim(None, value)
-        self.highlight.load(self)
-        self.queue_draw()
+        self._set_limit("max_top", value)
 
     @GObject.Property(type=float)
     def min_right(self) -> float:
         """Lower limit for the right axis."""
-        return self._right_axis.get_ylim()[0]
+        return self._get_limit("min_right")
 
     @min_right.setter
     def min_right(self, value: float) -> None:
-        for axis in (self._right_axis, self._top_right_axis):
-            axis.set_ylim(value, None)
-        self.queue_draw()
+        self._set_limit("min_right", value)
 
     @GObject.Property(type=float)
     def max_right(self) -> float:
         """Upper limit for the right axis."""
-        return self._right_axis.get_ylim()[1]
+        return self._get_limit("max_right")
 
     @max_right.setter
     def max_right(self, value: float) -> None:
-        for axis in (self._right_axis, self._top_right_axis):
-            axis.set_ylim(None, value)
-        self.queue_draw()
+        self._set_limit("max_right", value)
 
 
 class _DummyToolbar(NavigationToolbar2):
@@ -846,9 +1056,23 @@ class _DummyToolbar(NavigationToolbar2):
             self.canvas.set_cursor(tools.Cursors.POINTER)
             self._last_cursor = tools.Cursors.POINTER
 
+    # Overwritten function - do not change name
+    def press_pan(self, event) -> None:
+        """Start panning, only moving the cached data until release."""
+        super().press_pan(event)
+        if self._pan_info is not None:
+            self.canvas._start_blit(pan_axis=self._pan_info.axes[0])
+
+    # Overwritten function - do not change name
+    def release_pan(self, event) -> None:
+        """Stop panning and draw the full figure."""
+        self.canvas._stop_blit()
+        super().release_pan(event)
+
     # Overwritten function - do not change name
     def drag_pan(self, event):
         """Handle dragging in pan/zoom mode."""
+        self.canvas._apply_updates()
         for ax in self._pan_info.axes:
             # Using the recorded button at the press is safer than the current
             # button, as multiple buttons can get pressed during motion.
@@ -883,6 +1107,7 @@ class _DummyToolbar(NavigationToolbar2):
 
     # Overwritten function - do not change name
     def draw_rubberband(self, _event, x0, y0, x1, y1) -> None:
+        self.canvas._start_blit()
         self.canvas._rubberband_rect = [
             int(val) for val in
             (x0, self.canvas.figure.bbox.height - y0, x1 - x0, y0 - y1)
@@ -891,6 +1116,7 @@ class _DummyToolbar(NavigationToolbar2):
 
     # Overwritten function - do not change name
     def remove_rubberband(self) -> None:
+        self.canvas._stop_blit()
         self.canvas._rubberband_rect = None
         self.canvas.queue_draw()
 
@@ -908,6 +1134,24 @@ class _DummyToolbar(NavigationToolbar2):
         pass
 
 
+class _Blit():
+    """Cached renderings of the canvas used while dragging."""
+
+    def __init__(
+        self,
+        background: cairo.ImageSurface,
+        overlay: list,
+        layer_artists: list,
+    ):
+        self.background = background
+        self.overlay = overlay
+        self.layer_artists = layer_artists
+        self.layer = None
+        self.axis = None
+        self.origin = None
+        self.reference = None
+
+
 class _Highlight(SpanSelector):
 
     def __init__(self, canvas: Canvas):
@@ -928,6 +1172,20 @@ class _Highlight(SpanSelector):
         )
         self.load(canvas)
 
+    # Overwritten function - do not change name
+    def press(self, event) -> bool:
+        """Start a drag, only drawing the span until release."""
+        handled = super().press(event)
+        if handled:
+            self.canvas._start_blit(overlay=self.artists)
+        return handled
+
+    # Overwritten function - do not change name
+    def release(self, event) -> bool:
+        """Stop the drag and draw the full figure."""
+        self.canvas._stop_blit()
+        return super().release(event)
+
     def load(self, canvas: Canvas) -> None:
         xmin, xmax = canvas.axes[1].get_xlim()
         scale = scales.Scale(canvas.props.top_scale).value
@@ -1,17 +1,26 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """Curve fitting module."""
-import re
+import logging
+import threading
+import time
 from gettext import gettext as _
 
-from gi.repository import Adw, Gio, Graphs, Gtk
+from gi.repository import Adw, GLib, Gio, Graphs, Gtk
 
-from graphs import utilities
+from graphs import fitting, utilities
 from graphs.canvas import Canvas
 from graphs.item import DataItem, EquationItem, FillItem
 
 import numpy
 
-from scipy.optimize import _minpack, curve_fit
+# Delay in milliseconds between the last change and the start of a fit
+_FIT_DELAY = 250
+# Minimal time in seconds between progress updates of a running fit
+_PROGRESS_INTERVAL = 0.1
+
+
+class _FitCancelledError(Exception):
+    """Raised inside a running fit that has been superseded."""
 
 
 class CurveFittingDialog(Graphs.CurveFittingDialog):
@@ -27,7 +36,12 @@ class CurveFittingDialog(Graphs.CurveFittingDialog):
         self.connect("equation_change", self.on_equation_change)
         self.connect("fit_curve_request", self.fit_curve)
         self.connect("add_fit_request", self.add_fit)
+        self.connect("fit_selected_request", self.fit_selected)
+        self.connect("closed", self._cancel_fit)
         self.fitting_parameters = FittingParameterContainer()
+        self._fit_generation = 0
+        self._fit_source_id = 0
+        self._fit_evaluations = 0
         style = \
             application.get_figure_style_manager().get_system_style_params()
 
@@ -90,9 +104,9 @@ class CurveFittingDialog(Graphs.CurveFittingDialog):
         Set the free variables and corresponding entry rows when the equation
         has been changed.
         """
-        processed_equation = utilities.preprocess(equation)
+        processed_equation, _expression, free_variables = \
+            utilities.compile_equation(equation)
         self.set_equation_string(processed_equation)
-        free_variables = utilities.get_free_variables(processed_equation)
         if len(free_variables) == 0:
             self.set_results(error="equation")
             return False
@@ -192,6 +206,10 @@ class CurveFittingDialog(Graphs.CurveFittingDialog):
             buffer_string += _(
                 "Please enter valid fitting bounds \nto start the fit",
             )
+        elif error == "running":
+            buffer_string += _(
+                "Fitting, {evaluations} function evaluations",
+            ).format(evaluations=self._fit_evaluations)
         else:
             free_variables = utilities.get_free_variables(
                 self.get_equation_string(),
@@ -222,117 +240,143 @@ class CurveFittingDialog(Graphs.CurveFittingDialog):
 
     def fit_curve(self, *_args) -> bool:
         """
-        Fit the data to the equation in the entry.
+        Schedule fitting the data to the equation in the entry.
 
-        Returns a boolean indicating whether the fit was succesfull or not.
+        The fit starts in a worker thread once no changes have been made for
+        `_FIT_DELAY` milliseconds. Any running fit is cancelled. Returns a
+        boolean indicating whether the equation could be parsed.
         """
-
-        def _get_equation_name(equation_name, values):
-            """Obtain the equation name with the fitted parameter values."""
-            free_variables = utilities.get_free_variables(
-                self.get_equation_string(),
-            )
-            var_to_val = dict(zip(free_variables, values))
-            for var, val in var_to_val.items():
-                if var.lower() == "e":
-                    pattern = r"(?<!\d)[Ee]|(?!\d)[Ee](?![-+]?\d)"
-                else:
-                    pattern = (
-                        r"((?<=[\d\)])|\b)" + var
-                        + r"((?=[\u2070-\u209f\u00b0-\u00be])|\b)"
-                    )
-                value = utilities.sig_fig_round(val, 3)
-                equation_name = \
-                    re.sub(pattern, f"({value})", equation_name)
-            return equation_name
-
-        function = utilities.string_to_function(self.get_equation_string())
+        function = utilities.string_to_model(self.get_equation_string())[0]
         if function is None:
             return False
+        self._cancel_fit()
+        self._fit_source_id = GLib.timeout_add(_FIT_DELAY, self._start_fit)
+        return True
+
+    def _cancel_fit(self, *_args) -> None:
+        """Cancel the scheduled or running fit."""
+        self._fit_generation += 1
+        if self._fit_source_id:
+            GLib.source_remove(self._fit_source_id)
+            self._fit_source_id = 0
+
+    def _start_fit(self) -> bool:
+        """Start fitting in a worker thread."""
+        self._fit_source_id = 0
+        self._fit_evaluations = 0
+        self.set_results(error="running")
+        threading.Thread(
+            target=self._fit_worker,
+            args=(
+                self._fit_generation,
+                self.get_equation_string(),
+                self.data_curve.xdata,
+                self.data_curve.ydata,
+                self.fitting_parameters.get_p0(),
+                self.fitting_parameters.get_bounds(),
+                self.get_settings().get_string("optimization"),
+            ),
+            daemon=True,
+        ).start()
+        return GLib.SOURCE_REMOVE
+
+    def _fit_worker(self, generation: int, *args) -> None:
+        """Run a fit, results are passed to the main loop."""
+        evaluations = 0
+        last_update = time.monotonic()
+
+        def callback():
+            nonlocal evaluations, last_update
+            if generation != self._fit_generation:
+                raise _FitCancelledError
+            evaluations += 1
+            if time.monotonic() - last_update > _PROGRESS_INTERVAL:
+                last_update = time.monotonic()
+                GLib.idle_add(self._on_fit_progress, generation, evaluations)
+
         try:
-            self.param, self.param_cov = curve_fit(
-                function,
-                self.data_curve.xdata, self.data_curve.ydata,
-                p0=self.fitting_parameters.get_p0(),
-                bounds=self.fitting_parameters.get_bounds(),
-                nan_policy="omit",
-                method=self.get_settings().get_string("optimization"),
-            )
-        except (ValueError, TypeError, _minpack.error, RuntimeError):
+            result = fitting.fit_data(*args, callback=callback)
+        except _FitCancelledError:
+            return
+        # Report unexpected errors as failed fit, instead of leaving the
+        # dialog running forever
+        except Exception:  # noqa: PIE786
+            logging.exception("Could not fit curve")
+            result = None
+        GLib.idle_add(self._on_fit_done, generation, result)
+
+    def _on_fit_progress(self, generation: int, evaluations: int) -> bool:
+        if generation == self._fit_generation:
+            self._fit_evaluations = evaluations
+            self.set_results(error="running")
+        return GLib.SOURCE_REMOVE
+
+    def _on_fit_done(self, generation: int, result: tuple) -> bool:
+        """Apply the results of a fit, unless it has been superseded."""
+        if generation != self._fit_generation:
+            return GLib.SOURCE_REMOVE
+        if result is None:
             # Cancel fit if not successful
             self.set_results(error="equation")
-            return False
+            return GLib.SOURCE_REMOVE
+        self.param, self.param_cov, r2 = result
+        self.r2 = utilities.sig_fig_round(r2, 3)
 
-        equation = _get_equation_name(
-            str(self.get_custom_equation().get_text()).lower(),
+        equation = fitting.get_fitted_equation(
+            str(self.get_custom_equation().get_text()),
             self.param,
         )
         self.fitted_curve.equation = equation
         self.fitted_curve.set_name(f"Y = {self.fitted_curve.equation}")
-        self.get_confidence(function)
+        self.get_confidence(
+            *utilities.string_to_model(self.get_equation_string()),
+        )
         self.set_results()
-        return True
+        return GLib.SOURCE_REMOVE
 
-    def get_confidence(self, function: str) -> None:
+    def get_confidence(self, function, jacobian) -> None:
         """
-        Obtain the confidence interval from the fit.
+        Obtain the confidence band from the fit.
 
-        Get the confidence interval in terms of the standard deviation
-        resulting from the covariance in the plot. The bounds are navively
-        calculated by using the extremes on each parameter for both sides
-        of the bounds.
+        The band is calculated using the delta method, the covariance of the
+        parameters is propagated through the Jacobian of the model. Its width
+        is the chosen number of standard deviations.
         """
-        # Get standard deviation
         self.get_canvas().axes[0].relim()  # Reset limits
-        self.sigma = numpy.sqrt(numpy.diagonal(self.param_cov))
-        self.sigma *= self.get_settings().get_enum("confidence")
-        try:
-            fitted_y = [
-                function(x, *self.param) for x in self.data_curve.xdata
-            ]
-        except (OverflowError, ZeroDivisionError):
+        confidence = self.get_settings().get_enum("confidence")
+        self.sigma = numpy.sqrt(numpy.diagonal(self.param_cov)) * confidence
+        # Includes limits that are not yet applied to the axes
+        canvas = self.get_canvas()
+        limits = (canvas.props.min_bottom, canvas.props.max_bottom)
+        xdata = utilities.equation_to_data(
+            self.fitted_curve.equation, limits,
+        )[0]
+        if xdata is None:
             return
-        ss_res = numpy.sum(
-            (numpy.asarray(self.data_curve.ydata)
-             - numpy.asarray(fitted_y))**2,
-        )
-        ss_sum = numpy.sum((self.data_curve.ydata - numpy.mean(fitted_y))**2)
-        self.r2 = utilities.sig_fig_round(1 - (ss_res / ss_sum), 3)
-        limits = self.get_canvas()._axis.get_xlim()
-        xdata, ydata = utilities.equation_to_data(self.fitted_curve.equation,
-                                                  limits)
-        xdata, ydata = numpy.asarray(xdata), numpy.asarray(ydata)
+
         # Get confidence band
-        upper_bound = function(
-            xdata,
-            *(self.param + self.sigma),
-        )
-        lower_bound = function(
-            xdata,
-            *(self.param - self.sigma),
-        )
+        with numpy.errstate(all="ignore"):
+            ydata = function(xdata, *self.param)
+            jac = jacobian(xdata, *self.param)
+            variance = numpy.einsum("ij,jk,ik->i", jac, self.param_cov, jac)
+            deviation = confidence * numpy.sqrt(variance)
+        lower_bound = ydata - deviation
+        upper_bound = ydata + deviation
 
         # Filter non-finite values from the bounds
-        lower_bound = lower_bound[numpy.isfinite(lower_bound)]
-        upper_bound = upper_bound[numpy.isfinite(upper_bound)]
-
-        # Cancel if there's no valid values left after filtering non-finite
-        if len(upper_bound) == 0 or len(lower_bound) == 0:
+        finite = numpy.isfinite(lower_bound) & numpy.isfinite(upper_bound)
+        if not finite.any():
             return
-
-        span = max(ydata) - min(ydata)
-        middle = (max(ydata) - min(ydata)) / 2
+        xdata, ydata = xdata[finite], ydata[finite]
 
         # Don't try to draw complicated and resource-hogging bounds when
-        # far out of range, instead set them to be single-values far away
-        if max(upper_bound) > middle + 1e5 * span:
-            upper_bound = [middle + 1e5 * span]
-        if min(lower_bound) < middle - 1e5 * span:
-            lower_bound = [middle - 1e5 * span]
+        # far out of range, instead clip them to values far away
+        span = ydata.max() - ydata.min()
+        middle = (ydata.max() + ydata.min()) / 2
         self.fill.props.data = (
             xdata,
-            lower_bound,
-            upper_bound,
+            numpy.maximum(lower_bound[finite], middle - 1e5 * span),
+            numpy.minimum(upper_bound[finite], middle + 1e5 * span),
         )
 
     @staticmethod
@@ -342,6 +386,63 @@ class CurveFittingDialog(Graphs.CurveFittingDialog):
         data.add_items([self.fitted_curve])
         self.close()
 
+    @staticmethod
+    def fit_selected(self) -> None:
+        """
+        Fit the equation to all selected datasets in the main application.
+
+        Fits run in a process pool, fitted equations are added in a single
+        history state and a table with the results is shown.
+        """
+        datasets = [
+            (item_.get_name(), item_.props.xdata, item_.props.ydata)
+            for item_ in self.props.window.get_data()
+            if isinstance(item_, DataItem) and item_.get_selected()
+        ]
+        if not datasets:
+            return
+        self._cancel_fit()
+        self.set_sensitive(False)
+        self.get_text_view().get_buffer().set_text(
+            _("Fitting {amount} datasets").format(amount=len(datasets)),
+        )
+
+        def fit_worker(*args):
+            rows, message = None, None
+            try:
+                rows = fitting.fit_datasets(*args)
+            except Exception as error:  # noqa: PIE786
+                logging.exception("Could not fit selected datasets")
+                message = str(error)
+            finally:
+                GLib.idle_add(self._on_fit_selected_done, rows, message)
+
+        threading.Thread(
+            target=fit_worker,
+            args=(
+                str(self.get_custom_equation().get_text()),
+                datasets,
+                self.fitting_parameters.get_p0(),
+                self.fitting_parameters.get_bounds(),
+                self.get_settings().get_string("optimization"),
+            ),
+            daemon=True,
+        ).start()
+
+    def _on_fit_selected_done(self, rows: list, message: str) -> bool:
+        self.set_sensitive(True)
+        if rows is None:
+            self.get_text_view().get_buffer().set_text("")
+            self.add_toast_string(
+                _("Could not fit selected datasets: {error}").format(
+                    error=message,
+                ),
+            )
+            return GLib.SOURCE_REMOVE
+        fitting.add_fitted_items(self.props.window.get_data(), rows)
+        self.get_text_view().get_buffer().set_text(fitting.format_table(rows))
+        return GLib.SOURCE_REMOVE
+
 
 class FittingParameterContainer():
     """
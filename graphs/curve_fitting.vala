@@ -55,6 +55,7 @@ namespace Graphs {
         protected signal bool equation_change (string equation);
         protected signal void fit_curve_request ();
         protected signal void add_fit_request ();
+        protected signal void fit_selected_request ();
 
         protected void setup () {
             var application = window.application as Application;
@@ -86,6 +87,11 @@ namespace Graphs {
                 BindingFlags.SYNC_CREATE
             );
             action_map.add_action (toggle_sidebar_action);
+            var fit_selected_action = new SimpleAction ("fit_selected", null);
+            fit_selected_action.activate.connect (() => {
+                fit_selected_request.emit ();
+            });
+            action_map.add_action (fit_selected_action);
             insert_action_group ("win", action_map);
 
             equation.set_selected (settings.get_enum ("equation"));
@@ -102,6 +108,15 @@ namespace Graphs {
             set_equation ();
         }
 
+        /**
+         * Add a toast to the dialog.
+         *
+         * The toast is created automatically with the given title.
+         */
+        public void add_toast_string (string title) {
+            toast_overlay.add_toast (new Adw.Toast (title));
+        }
+
         private void emit_fit_curve_request () {
             fit_curve_request.emit ();
         }
@@ -8,7 +8,7 @@ from gettext import gettext as _
 
 from gi.repository import GObject, Gio, Graphs
 
-from graphs import item, misc, project, style_io, utilities
+from graphs import item, misc, profiling, project, style_cache, utilities
 
 from matplotlib import RcParams
 
@@ -18,6 +18,48 @@ _FIGURE_SETTINGS_HISTORY_IGNORELIST = misc.LIMITS + [
     "min_selected",
     "max_selected",
 ]
+# Estimated size of a single change in bytes, excluding arrays
+_HISTORY_CHANGE_SIZE = 256
+
+
+def _copy_value(value):
+    """Deep copy a value, arrays are immutable and therefore shared."""
+    if isinstance(value, numpy.ndarray):
+        return value
+    return copy.deepcopy(value)
+
+
+def _copy_item_dict(item_dict: dict) -> dict:
+    """Copy an item dict without copying its arrays."""
+    return {key: _copy_value(value) for key, value in item_dict.items()}
+
+
+def _get_changed_range(
+    old: numpy.ndarray,
+    new: numpy.ndarray,
+) -> (int, int):
+    """
+    Get the range of indices in which two arrays of equal shape differ.
+
+    Values are compared bitwise, so that nan values are handled as well.
+    """
+    changed = numpy.flatnonzero(
+        old.view(numpy.int64) != new.view(numpy.int64),
+    )
+    if len(changed) == 0:
+        return 0, 0
+    return int(changed[0]), int(changed[-1]) + 1
+
+
+def _get_size(value) -> int:
+    """Get the size of all arrays in value in bytes."""
+    if isinstance(value, numpy.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (list, tuple)):
+        return 0
+    return sum(_get_size(item_) for item_ in value)
 
 
 class Data(Graphs.Data):
@@ -90,7 +132,7 @@ class Data(Graphs.Data):
                         if style.get_mutable():
                             validate = style_manager.get_system_style_params()
                         self._old_style_params = self._selected_style_params
-                        style_params = style_io.parse(
+                        style_params = style_cache.parse(
                             style.get_file(),
                             validate,
                         )[0]
@@ -125,7 +167,7 @@ class Data(Graphs.Data):
 
     @staticmethod
     def _on_item_added(self, item_: Graphs.Item) -> None:
-        self._current_batch.append((1, copy.deepcopy(item_.to_dict())))
+        self._current_batch.append((1, _copy_item_dict(item_.to_dict())))
 
     @staticmethod
     def _on_item_deleted(self, item_: Graphs.Item) -> None:
@@ -133,13 +175,32 @@ class Data(Graphs.Data):
 
     @staticmethod
     def _on_item_changed(self, item_: Graphs.Item, prop: str) -> None:
+        old_value = self._data_copy[item_.get_uuid()][prop]
+        new_value = item_.get_property(prop)
+        if isinstance(new_value, numpy.ndarray) \
+                and old_value.shape == new_value.shape:
+            start, stop = _get_changed_range(old_value, new_value)
+            # Only store the changed range if it is cheaper than storing the
+            # old array, the new array is shared with the item itself
+            if 2 * (stop - start) < len(new_value):
+                self._current_batch.append((
+                    5,
+                    (
+                        item_.get_uuid(),
+                        prop,
+                        start,
+                        old_value[start:stop].copy(),
+                        new_value[start:stop].copy(),
+                    ),
+                ))
+                return
         self._current_batch.append((
             0,
             (
                 item_.get_uuid(),
                 prop,
-                copy.deepcopy(self._data_copy[item_.get_uuid()][prop]),
-                copy.deepcopy(item_.get_property(prop)),
+                _copy_value(old_value),
+                _copy_value(new_value),
             ),
         ))
 
@@ -162,10 +223,10 @@ class Data(Graphs.Data):
     def _set_data_copy(self) -> None:
         """Set a deep copy for the data."""
         self._current_batch: list = []
-        self._data_copy = copy.deepcopy({
-            item_.get_uuid(): item_.to_dict()
+        self._data_copy = {
+            item_.get_uuid(): _copy_item_dict(item_.to_dict())
             for item_ in self
-        })
+        }
         self._figure_settings_copy = copy.deepcopy({
             prop.replace("_", "-"):
             self.props.figure_settings.get_property(prop)
@@ -192,12 +253,42 @@ class Data(Graphs.Data):
                 old_state[index] = old_limits[index]
         self.props.can_redo = False
         self.props.can_undo = True
-        # Keep history states length limited to 100 spots
-        if len(self._history_states) > 101:
-            self._history_states = self._history_states[1:]
+        self._limit_history_size()
         self._set_data_copy()
         self.props.unsaved = True
 
+    def _limit_history_size(self) -> None:
+        """Remove the oldest history states until they fit the size limit."""
+        max_size = self.props.application.get_settings().get_uint64(
+            "history-size",
+        )
+        sizes = [
+            _get_size(batch) + _HISTORY_CHANGE_SIZE * len(batch)
+            for batch, _limits in self._history_states
+        ]
+        # The first state only holds the initial limits, so it is not counted
+        total_size = sum(sizes[1:])
+        removed = 0
+        while total_size > max_size and len(sizes) - removed > 2:
+            removed += 1
+            total_size -= sizes[removed]
+        if removed:
+            self._history_states = [
+                ([], self._history_states[removed][1]),
+            ] + self._history_states[removed + 1:]
+
+    @staticmethod
+    def _set_array_range(
+        item_: Graphs.Item,
+        prop: str,
+        start: int,
+        values: numpy.ndarray,
+    ) -> None:
+        array = item_.get_property(prop).copy()
+        array[start:start + len(values)] = values
+        item_.set_property(prop, array)
+
+    @profiling.timed()
     def _undo(self) -> None:
         """Undo the latest change that was added to the clipboard."""
         if not self.props.can_undo:
@@ -211,7 +302,7 @@ class Data(Graphs.Data):
                 self._remove_item(self.get_for_uuid(change["uuid"]))
             elif change_type == 2:
                 self._add_item(
-                    item.new_from_dict(copy.deepcopy(change[1])),
+                    item.new_from_dict(_copy_item_dict(change[1])),
                     change[0],
                     True,
                 )
@@ -222,6 +313,10 @@ class Data(Graphs.Data):
                     change[0],
                     change[1],
                 )
+            elif change_type == 5:
+                self._set_array_range(
+                    self[change[0]], change[1], change[2], change[3],
+                )
         self.get_figure_settings().set_limits(
             self._history_states[self._history_pos][1],
         )
@@ -231,6 +326,7 @@ class Data(Graphs.Data):
         self._set_data_copy()
         self._add_view_history_state()
 
+    @profiling.timed()
     def _redo(self) -> None:
         """Redo the latest change that was added to the clipboard."""
         if not self.props.can_redo:
@@ -242,7 +338,7 @@ class Data(Graphs.Data):
                 self[change[0]].set_property(change[1], change[3])
             elif change_type == 1:
                 self._add_item(
-                    item.new_from_dict(copy.deepcopy(change)),
+                    item.new_from_dict(_copy_item_dict(change)),
                     -1,
                     True,
                 )
@@ -255,6 +351,10 @@ class Data(Graphs.Data):
                     change[0],
                     change[2],
                 )
+            elif change_type == 5:
+                self._set_array_range(
+                    self[change[0]], change[1], change[2], change[4],
+                )
         self.get_figure_settings().set_limits(state[1])
         self.props.can_redo = self._history_pos < -1
         self.props.can_undo = True
@@ -307,17 +407,23 @@ class Data(Graphs.Data):
         self.props.can_view_forward = self._view_history_pos < -1
 
     @staticmethod
-    def _get_min_max_from_array(xydata: list, scale: int) -> (float, float):
-        try:
-            xydata = xydata[numpy.isfinite(xydata)]
-        except TypeError:
+    def _get_min_max(extents: tuple, scale: int) -> (float, float):
+        """
+        Get the limits of extents.
+
+        Only positive values are used for logarithmic and square root scales.
+        Returns None if there are no values to use.
+        """
+        min_value, max_value, min_positive = extents
+        if min_value is None:
             return None
-        nonzero_data = numpy.array([value for value in xydata if value != 0])
-        min_value = nonzero_data.min() if scale in (1, 2, 4) \
-            and len(nonzero_data) > 0 else xydata.min()
-        max_value = xydata.max()
+        if scale in (1, 2, 4):
+            if min_positive is None:
+                return None
+            min_value = min_positive
         return min_value, max_value
 
+    @profiling.timed()
     def _optimize_limits(self) -> None:
         """Optimize the limits of the canvas to the data class."""
         figure_settings = self.get_figure_settings()
@@ -341,17 +447,11 @@ class Data(Graphs.Data):
             for index in \
                     item_.get_xposition() * 2, 1 + item_.get_yposition() * 2:
                 axis = axes[index]
-                axis[1] = True
-
-                xdata = copy.deepcopy(item_.xdata)
-                ydata = copy.deepcopy(item_.ydata)
-
-                min_max = self._get_min_max_from_array(
-                    numpy.asarray(ydata if index % 2 else xdata),
-                    axis[4],
-                )
+                extents = item_.get_extents("ydata" if index % 2 else "xdata")
+                min_max = self._get_min_max(extents, axis[4])
                 if min_max is None:
-                    return
+                    continue
+                axis[1] = True
                 min_value, max_value = min_max
                 axis[2].append(min_value)
                 axis[3].append(max_value)
@@ -367,16 +467,15 @@ class Data(Graphs.Data):
                     figure_settings.get_property(f"min_{direction}"),
                     figure_settings.get_property(f"max_{direction}"),
                 ]
-            yaxis[1] = True
-
             ydata = utilities.equation_to_data(item_.equation, x_limits)[1]
-
-            min_max = self._get_min_max_from_array(
-                numpy.asarray(ydata),
-                yaxis[4],
+            if ydata is None:
+                return
+            min_max = self._get_min_max(
+                utilities.get_extents(ydata), yaxis[4],
             )
             if min_max is None:
-                return
+                continue
+            yaxis[1] = True
             min_value, max_value = min_max
             yaxis[2].append(min_value)
             yaxis[3].append(max_value)
@@ -2,7 +2,7 @@
 """Module for Editing an Item."""
 from gi.repository import Adw, GObject, Graphs, Gtk
 
-from graphs import utilities
+from graphs import profiling, utilities
 from graphs.item import DataItem, EquationItem, GeneratedDataItem
 
 import sympy
@@ -97,7 +97,8 @@ class EditItemDialog(Adw.Dialog):
     def on_simplify(self, _buttonrow) -> None:
         """Simplify the equation."""
         equation = self.props.item.props.equation
-        equation = str(sympy.simplify(utilities.preprocess(equation)))
+        with profiling.section("sympy.simplify"):
+            equation = str(sympy.simplify(utilities.preprocess(equation)))
         equation = utilities.prettify_equation(equation)
         self.props.item.props.equation = equation
         self._equation_entry.set_text(equation)
@@ -1,12 +1,33 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
-"""Module for Exporting data."""
+"""
+Module for Exporting data.
+
+Text files are compressed with gzip or xz if their name ends with .gz or
+.xz respectively.
+
+    Functions:
+        export_items
+"""
+import contextlib
+import gzip
+import lzma
 import sys
+from collections.abc import Callable
 
 from gi.repository import Gio, Graphs
 
-from graphs import utilities
+import gio_pyio
+
+from graphs import profiling, utilities
 from graphs.item import DataItem, EquationItem
 
+import numpy
+
+_DELIMITER = "\t"
+_FORMAT = "%.12e"
+# Amount of rows formatted with a single string operation
+_CHUNK_SIZE = 65536
+
 
 def export_items(
     mode: str,
@@ -25,16 +46,121 @@ def _export_columns(
     figure_settings: Graphs.FigureSettings,
 ) -> None:
     """Save Items in columns format."""
+    _export_separately(file, items, figure_settings, _save_item, ".txt")
+
+
+def _export_npy(
+    file: Gio.File,
+    items: list[Graphs.Item],
+    figure_settings: Graphs.FigureSettings,
+) -> None:
+    """Save Items as NumPy arrays with x- and y-values in columns."""
+    _export_separately(file, items, figure_settings, _save_npy, ".npy")
+
+
+def _export_npz(
+    file: Gio.File,
+    items: list[Graphs.Item],
+    figure_settings: Graphs.FigureSettings,
+) -> None:
+    """Save all Items in a single NumPy archive, named after the items."""
+    arrays = {}
+    for item in items:
+        name, index = item.get_name(), 1
+        while name in arrays:
+            index += 1
+            name = f"{item.get_name()} ({index})"
+        arrays[name] = numpy.column_stack(_get_data(item, figure_settings))
+    with gio_pyio.open(file, "wb") as wrapper:
+        numpy.savez(wrapper, **arrays)
+
+
+def _export_multicolumn(
+    file: Gio.File,
+    items: list[Graphs.Item],
+    figure_settings: Graphs.FigureSettings,
+) -> None:
+    """
+    Save all Items in a single file, with two columns per item.
+
+    The header holds the x-label and name of every item. Shorter items are
+    padded with nan.
+    """
+    data = [_get_data(item, figure_settings) for item in items]
+    length = max(len(xdata) for xdata, _ydata in data)
+    array = numpy.full((length, 2 * len(items)), numpy.nan)
+    for index, (xdata, ydata) in enumerate(data):
+        array[:len(xdata), 2 * index] = xdata
+        array[:len(ydata), 2 * index + 1] = ydata
+    header = _DELIMITER.join(
+        label for item in items
+        for label in (item.get_xlabel() or "x", item.get_name())
+    )
+    with _open_text(file) as stream:
+        _write_columns(stream, header, array)
+
+
+def _export_separately(
+    file: Gio.File,
+    items: list[Graphs.Item],
+    figure_settings: Graphs.FigureSettings,
+    callback: Callable,
+    suffix: str,
+) -> None:
+    """Save Items in file, or in a file per item if file is a directory."""
     if len(items) > 1:
         for item in items:
-            name = f"{item.get_name()}.txt"
-            _save_item(
-                file.get_child_for_display_name(name),
+            callback(
+                file.get_child_for_display_name(item.get_name() + suffix),
                 item,
                 figure_settings,
             )
     else:
-        _save_item(file, items[0], figure_settings)
+        callback(file, items[0], figure_settings)
+
+
+@contextlib.contextmanager
+def _open_text(file: Gio.File):
+    """Open a binary stream for text, compressed according to the suffix."""
+    name = file.get_basename()
+    with gio_pyio.open(file, "wb") as wrapper:
+        if name.endswith(".gz"):
+            compressed = gzip.GzipFile(
+                filename="", mode="wb", fileobj=wrapper, compresslevel=6,
+            )
+        elif name.endswith(".xz"):
+            compressed = lzma.LZMAFile(wrapper, "wb", preset=1)
+        else:
+            compressed = contextlib.nullcontext(wrapper)
+        with compressed as stream:
+            yield stream
+
+
+def _write_columns(stream, header: str, array: numpy.ndarray) -> None:
+    """Write a 2D array as delimited text, formatting chunks at once."""
+    if header:
+        stream.write((header + "\n").encode())
+    row_format = _DELIMITER.join([_FORMAT] * array.shape[1]) + "\n"
+    with profiling.section("export_items.write_columns", len(array)):
+        for start in range(0, len(array), _CHUNK_SIZE):
+            chunk = array[start:start + _CHUNK_SIZE]
+            values = tuple(chunk.ravel().tolist())
+            stream.write(((row_format * len(chunk)) % values).encode())
+
+
+def _get_data(
+    item: DataItem | EquationItem,
+    figure_settings: Graphs.FigureSettings,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Get the x- and y-data of an item."""
+    if isinstance(item, DataItem):
+        return item.xdata, item.ydata
+    limits = figure_settings.get_limits()
+    if item.get_xposition() == 0:
+        limits = [limits[0], limits[1]]
+    elif item.get_xposition() == 1:
+        limits = [limits[2], limits[3]]
+    return utilities.equation_to_data(item.equation, limits)
 
 
 def _save_item(
@@ -43,23 +169,21 @@ def _save_item(
     figure_settings: Graphs.FigureSettings,
 ) -> None:
     """Save Item in columns format."""
-    delimiter = "\t"
-    fmt = delimiter.join(["%.12e"] * 2)
     xlabel, ylabel = item.get_xlabel(), item.get_ylabel()
-    stream = Gio.DataOutputStream.new(
-        file.replace(None, False, Gio.FileCreateFlags.NONE, None),
-    )
-    if xlabel != "" and ylabel != "":
-        stream.stream(xlabel + delimiter + ylabel + "\n")
-    if isinstance(item, DataItem):
-        xdata, ydata = item.xdata, item.ydata
-    elif isinstance(item, EquationItem):
-        limits = figure_settings.get_limits()
-        if item.get_xposition() == 0:
-            limits = [limits[0], limits[1]]
-        elif item.get_xposition() == 1:
-            limits = [limits[2], limits[3]]
-        xdata, ydata = utilities.equation_to_data(item.equation, limits)
-    for values in zip(xdata, ydata):
-        stream.put_string(fmt % values + "\n")
-    stream.close()
+    header = xlabel + _DELIMITER + ylabel \
+        if xlabel != "" and ylabel != "" else ""
+    array = numpy.column_stack(_get_data(item, figure_settings))
+    with _open_text(file) as stream:
+        _write_columns(stream, header, array)
+
+
+def _save_npy(
+    file: Gio.File,
+    item: DataItem | EquationItem,
+    figure_settings: Graphs.FigureSettings,
+) -> None:
+    """Save Item as NumPy array."""
+    with gio_pyio.open(file, "wb") as wrapper:
+        numpy.save(
+            wrapper, numpy.column_stack(_get_data(item, figure_settings)),
+        )
@@ -4,45 +4,116 @@ using Gtk;
 namespace Graphs {
     namespace Export {
         public void export_items (Window window) {
-            var application = window.application as Application;
             Data data = window.data;
             if (data.is_empty ()) {
                 window.add_toast_string (_("No data to export"));
                 return;
             }
+            Item[] items = {};
+            foreach (Item item in data) {
+                if (item.selected) items += item;
+            }
+            if (items.length == 0) {
+                window.add_toast_string (_("No selected items to export"));
+                return;
+            }
 
-            var dialog = new FileDialog ();
-            if (data.get_n_items () > 1) {
-                dialog.select_folder.begin (window, null, (d, response) => {
-                    try {
-                        application.python_helper.export_items (
-                            window,
-                            "columns",
-                            dialog.select_folder.end (response),
-                            data.get_items ()
-                        );
-                    } catch {}
-                });
-            } else {
-                Item item = data.get_item (0) as Item;
-                dialog.set_initial_name (item.name + ".txt");
-                dialog.set_filters (Tools.create_file_filters (
-                    true,
-                    Tools.create_file_filter (
-                        C_("file-filter", "Text Files"), "txt"
-                    )
-                ));
-                dialog.save.begin (window, null, (d, response) => {
-                    try {
-                        application.python_helper.export_items (
-                            window,
-                            "columns",
-                            dialog.save.end (response),
-                            data.get_items ()
-                        );
-                    } catch {}
-                });
+            if (items.length == 1) {
+                export_item (window, items[0]);
+                return;
             }
+            var dialog = Tools.build_dialog ("export_items") as Adw.AlertDialog;
+            dialog.response.connect ((d, response) => {
+                if (response == "folder") export_to_folder (window, items);
+                else if (response == "file") export_to_file (window, items);
+            });
+            dialog.present (window);
+        }
+
+        /**
+         * Export a single item to a text file or NumPy array
+         */
+        private void export_item (Window window, Item item) {
+            var application = window.application as Application;
+            Item[] items = {item};
+            var dialog = new FileDialog ();
+            dialog.set_initial_name (item.name + ".txt");
+            dialog.set_filters (Tools.create_file_filters (
+                true,
+                Tools.create_file_filter (
+                    C_("file-filter", "Text Files"), "txt"
+                ),
+                Tools.create_file_filter (
+                    C_("file-filter", "Compressed Text Files"), "gz", "xz"
+                ),
+                Tools.create_file_filter (
+                    C_("file-filter", "NumPy Arrays"), "npy"
+                )
+            ));
+            dialog.save.begin (window, null, (d, response) => {
+                try {
+                    File file = dialog.save.end (response);
+                    application.python_helper.export_items (
+                        window,
+                        file.get_basename ().has_suffix (".npy")
+                            ? "npy" : "columns",
+                        file,
+                        items
+                    );
+                } catch {}
+            });
+        }
+
+        /**
+         * Export items to a text file per item in a folder
+         */
+        private void export_to_folder (Window window, Item[] items) {
+            var application = window.application as Application;
+            var dialog = new FileDialog ();
+            dialog.select_folder.begin (window, null, (d, response) => {
+                try {
+                    application.python_helper.export_items (
+                        window,
+                        "columns",
+                        dialog.select_folder.end (response),
+                        items
+                    );
+                } catch {}
+            });
+        }
+
+        /**
+         * Export items to a single text file with two columns per item, or
+         * to a NumPy archive
+         */
+        private void export_to_file (Window window, Item[] items) {
+            var application = window.application as Application;
+            var dialog = new FileDialog ();
+            dialog.set_initial_name (C_("filename", "Exported Data") + ".txt");
+            dialog.set_filters (Tools.create_file_filters (
+                true,
+                Tools.create_file_filter (
+                    C_("file-filter", "Text Files"), "txt"
+                ),
+                Tools.create_file_filter (
+                    C_("file-filter", "Compressed Text Files"), "gz", "xz"
+                ),
+                Tools.create_file_filter (
+                    C_("file-filter", "NumPy Archives"), "npz"
+                )
+            ));
+            dialog.save.begin (window, null, (d, response) => {
+                try {
+                    File file = dialog.save.end (response);
+                    application.python_helper.export_items (
+                        window,
+                        file.get_basename ().has_suffix (".npz")
+                            ? "npz" : "multicolumn",
+                        file,
+                        items
+                    );
+                } catch {}
+            });
         }
     }
 }
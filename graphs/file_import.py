@@ -4,10 +4,15 @@ Module for importing data from files.
 
     Functions:
         import_from_files
+        guess_import_mode
 """
+import concurrent.futures
+import logging
+import threading
+from gettext import gettext as _
 from pathlib import Path
 
-from gi.repository import Gio, Graphs
+from gi.repository import Adw, GLib, Gio, Graphs
 
 from graphs import parse_file
 from graphs.misc import ParseError
@@ -19,6 +24,8 @@ _IMPORT_MODES = {
     "xry": ".xry",
     "columns": None,
 }
+# Milliseconds before progress is shown and between its updates
+_PROGRESS_INTERVAL = 250
 
 
 def import_from_files(
@@ -30,31 +37,94 @@ def import_from_files(
 
     Automatically guesses, which mode to use. If configurable settings are
     present at /se/sjoerd/Graphs/import-params, a Window will be shown,
-    giving the option to configure them.
+    giving the option to configure them. Files are parsed in a thread pool,
+    showing progress with the option to cancel, and all items are added at
+    once.
     """
     application = window.get_application()
     settings = application.get_settings_child("import-params")
     import_dict = {mode: [] for mode, _value in _IMPORT_MODES.items()}
     for file in files:
-        import_dict[_guess_import_mode(file)].append(file)
+        import_dict[guess_import_mode(file)].append(file)
     modes = [mode for mode in settings.list_children() if import_dict[mode]]
 
     def do_import(_dialog):
-        items = []
         data = window.get_data()
         style = data.get_selected_style_params()
-        for mode, files in import_dict.items():
-            callback = getattr(parse_file, "import_from_" + mode)
-            params = settings.get_child(mode) if mode in modes else None
-            for file in files:
-                try:
-                    items.extend(callback(params, style, file))
-                except ParseError as error:
-                    application.get_active_window().add_toast_string(
-                        error.message,
-                    )
-                    continue
-        data.add_items(items)
+        tasks = [
+            (
+                getattr(parse_file, "import_from_" + mode),
+                settings.get_child(mode) if mode in modes else None,
+                file,
+            ) for mode, files in import_dict.items() for file in files
+        ]
+        cancelled = threading.Event()
+        progress = {"done": 0, "toast": None}
+
+        def parse(task):
+            callback, params, file = task
+            if cancelled.is_set():
+                return [], None
+            try:
+                return callback(params, style, file), None
+            except ParseError as error:
+                return [], error.message
+
+        def worker():
+            results, failed = [], []
+            try:
+                with concurrent.futures.ThreadPoolExecutor() as executor:
+                    futures = [executor.submit(parse, task) for task in tasks]
+                    for (_callback, _params, file), future \
+                            in zip(tasks, futures):
+                        try:
+                            results.append(future.result())
+                        except Exception:  # noqa: PIE786
+                            logging.exception(
+                                "Could not import %s", file.get_uri(),
+                            )
+                            failed.append(file)
+                        progress["done"] += 1
+            finally:
+                GLib.idle_add(on_done, results, failed)
+
+        def on_cancel(_toast):
+            cancelled.set()
+
+        def update_progress():
+            if progress["toast"] is None:
+                toast = Adw.Toast(timeout=0, button_label=_("Cancel"))
+                toast.connect("button-clicked", on_cancel)
+                window.add_toast(toast)
+                progress["toast"] = toast
+            progress["toast"].set_title(
+                _("Importing files ({done}/{total})").format(
+                    done=progress["done"], total=len(tasks),
+                ),
+            )
+            return GLib.SOURCE_CONTINUE
+
+        def on_done(results, failed):
+            GLib.source_remove(timeout_id)
+            if progress["toast"] is not None:
+                progress["toast"].dismiss()
+            if cancelled.is_set():
+                return GLib.SOURCE_REMOVE
+            items = []
+            for new_items, message in results:
+                items.extend(new_items)
+                if message is not None:
+                    window.add_toast_string(message)
+            if failed:
+                names = ", ".join(map(Graphs.tools_get_filename, failed))
+                window.add_toast_string(
+                    _("Could not import {files}").format(files=names),
+                )
+            data.add_items(items)
+            return GLib.SOURCE_REMOVE
+
+        timeout_id = GLib.timeout_add(_PROGRESS_INTERVAL, update_progress)
+        threading.Thread(target=worker, daemon=True).start()
 
     if modes:
         dialog = Graphs.ImportDialog.new(window, modes)
@@ -63,7 +133,8 @@ def import_from_files(
         do_import(None)
 
 
-def _guess_import_mode(file: Gio.File) -> str:
+def guess_import_mode(file: Gio.File) -> str:
+    """Guess the import mode from the suffix of a file."""
     try:
         filename = Graphs.tools_get_filename(file)
         file_suffix = Path(filename).suffixes[-1]
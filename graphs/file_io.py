@@ -1,12 +1,13 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """Module for file operations."""
 import json
-from xml.dom import minidom
 
 from gi.repository import Gio
 
 import gio_pyio
 
+import numpy
+
 
 def parse_json(file: Gio.File) -> dict:
     """Parse a json file to a python dict."""
@@ -14,6 +15,13 @@ def parse_json(file: Gio.File) -> dict:
         return json.load(wrapper)
 
 
+def _json_default(value):
+    """Serialize numpy types, which are not supported by json."""
+    if isinstance(value, (numpy.ndarray, numpy.generic)):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
 def write_json(file: Gio.File, json_object: dict, pretty_print=True) -> None:
     """Write a python dict to a python file."""
     with gio_pyio.open(file, "wt") as wrapper:
@@ -22,10 +30,5 @@ def write_json(file: Gio.File, json_object: dict, pretty_print=True) -> None:
             wrapper,
             indent=4 if pretty_print else None,
             sort_keys=True,
+            default=_json_default,
         )
-
-
-def parse_xml(file: Gio.File) -> dict:
-    """Parse a xml file to a python dict."""
-    with gio_pyio.open(file, "rb") as wrapper:
-        return minidom.parse(wrapper)
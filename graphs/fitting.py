@@ -0,0 +1,263 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+Curve fitting without user interface.
+
+Fit equations to data, either for a single dataset or for many datasets at
+once. Used by the curve fitting dialog and usable as Python API.
+
+    Functions:
+        fit_data
+        fit_datasets
+        fit_items
+        add_fitted_items
+        get_fitted_equation
+        format_table
+"""
+import concurrent.futures
+import multiprocessing
+import re
+from gettext import gettext as _
+
+import gi
+
+from graphs import utilities
+from graphs.item import DataItem, EquationItem
+
+import numpy
+
+from scipy.optimize import _minpack, curve_fit
+
+_FIT_ERRORS = (ValueError, TypeError, _minpack.error, RuntimeError)
+
+
+def fit_data(
+    equation: str,
+    xdata: numpy.ndarray,
+    ydata: numpy.ndarray,
+    p0: list = None,
+    bounds: tuple = (-numpy.inf, numpy.inf),
+    method: str = "trf",
+    callback=None,
+) -> tuple:
+    """
+    Fit a preprocessed equation to data.
+
+    The parameters are ordered as `utilities.get_free_variables(equation)`.
+    If given, callback is called before every evaluation of the model and
+    may raise an exception to abort the fit. Returns the parameters, their
+    covariance and R², or None if the fit failed.
+    """
+    function, jacobian = utilities.string_to_model(equation)
+    if function is None:
+        return None
+    if p0 is None:
+        p0 = [1] * len(utilities.get_free_variables(equation))
+
+    def model(x, *params):
+        if callback is not None:
+            callback()
+        return function(x, *params)
+
+    def model_jacobian(x, *params):
+        if callback is not None:
+            callback()
+        with numpy.errstate(all="ignore"):
+            values = jacobian(x, *params)
+        if not numpy.isfinite(values).all():
+            raise _JacobianError()
+        return values
+
+    # The symbolic Jacobian can be non-finite where the model is not, such as
+    # the derivative of a*x**b to b at x=0. Use finite differences instead,
+    # which is the default of curve_fit for every method.
+    xdata, ydata = numpy.asarray(xdata), numpy.asarray(ydata)
+    finite = numpy.isfinite(xdata) & numpy.isfinite(ydata)
+    with numpy.errstate(all="ignore"):
+        use_jacobian = numpy.isfinite(jacobian(xdata[finite], *p0)).all()
+    try:
+        try:
+            param, param_cov = _curve_fit(
+                model, xdata, ydata, p0, bounds, method,
+                model_jacobian if use_jacobian else None,
+            )
+        except _JacobianError:
+            param, param_cov = _curve_fit(
+                model, xdata, ydata, p0, bounds, method, None,
+            )
+    except _FIT_ERRORS:
+        return None
+    with numpy.errstate(all="ignore"):
+        fitted_y = function(xdata, *param)
+    ss_res = numpy.sum((ydata - fitted_y)**2)
+    ss_sum = numpy.sum((ydata - numpy.mean(fitted_y))**2)
+    return param, param_cov, 1 - ss_res / ss_sum
+
+
+class _JacobianError(Exception):
+    """Raised when the symbolic Jacobian is not finite during a fit."""
+
+
+def _curve_fit(model, xdata, ydata, p0, bounds, method, jac) -> tuple:
+    """Call curve_fit with the options used for all fits."""
+    return curve_fit(
+        model,
+        xdata, ydata,
+        p0=p0,
+        bounds=bounds,
+        nan_policy="omit",
+        method=method,
+        jac=jac,
+    )
+
+
+def get_fitted_equation(equation: str, values: list) -> str:
+    """Get the equation with its free variables replaced by values."""
+    equation = equation.lower()
+    free_variables = utilities.get_free_variables(
+        utilities.preprocess(equation),
+    )
+    for var, val in zip(free_variables, values):
+        if var.lower() == "e":
+            pattern = r"(?<!\d)[Ee]|(?!\d)[Ee](?![-+]?\d)"
+        else:
+            pattern = (
+                r"((?<=[\d\)])|\b)" + var
+                + r"((?=[\u2070-\u209f\u00b0-\u00be])|\b)"
+            )
+        value = utilities.sig_fig_round(val, 3)
+        equation = re.sub(pattern, f"({value})", equation)
+    return equation
+
+
+def _get_row(equation: str, name: str, result: tuple) -> dict:
+    """Convert a fit result to a row of the results table."""
+    if result is None:
+        return {"name": name, "equation": None}
+    param, param_cov, r2 = result
+    free_variables = utilities.get_free_variables(
+        utilities.preprocess(equation),
+    )
+    return {
+        "name": name,
+        "equation": get_fitted_equation(equation, param),
+        "parameters": dict(zip(free_variables, param)),
+        "sigmas": dict(zip(
+            free_variables, numpy.sqrt(numpy.diagonal(param_cov)),
+        )),
+        "r2": r2,
+    }
+
+
+def fit_datasets(
+    equation: str,
+    datasets: list,
+    p0: list = None,
+    bounds: tuple = (-numpy.inf, numpy.inf),
+    method: str = "trf",
+    reuse_parameters: bool = False,
+    max_workers: int = None,
+) -> list:
+    """
+    Fit one equation to many datasets.
+
+    Datasets are given as (name, xdata, ydata) and are fitted in parallel in
+    a process pool. If reuse_parameters is set, the parameters of each fit are
+    used as initial guess for the next dataset, so datasets are fitted one
+    after another instead. Returns a row per dataset with the name, fitted
+    equation, parameters, sigmas and R². Equation is None for failed fits.
+    """
+    processed_equation = utilities.preprocess(equation)
+    if reuse_parameters or len(datasets) < 2:
+        results = []
+        for _name, xdata, ydata in datasets:
+            result = fit_data(
+                processed_equation, xdata, ydata, p0, bounds, method,
+            )
+            if reuse_parameters and result is not None:
+                p0 = result[0]
+            results.append(result)
+    else:
+        # Spawn workers, forking is not safe with a running main loop. Workers
+        # do not run the launcher, so the version of Graphs is required there.
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=gi.require_version,
+            initargs=("Graphs", "1"),
+        ) as executor:
+            results = list(executor.map(
+                fit_data,
+                *zip(*(
+                    (processed_equation, xdata, ydata, p0, bounds, method)
+                    for _name, xdata, ydata in datasets
+                )),
+            ))
+    return [
+        _get_row(equation, name, result)
+        for (name, _xdata, _ydata), result in zip(datasets, results)
+    ]
+
+
+def fit_items(
+    equation: str,
+    items: list,
+    data=None,
+    **kwargs,
+) -> list:
+    """
+    Fit one equation to the data of many items.
+
+    Keyword arguments are passed to `fit_datasets`. If data is given, the
+    fitted equations are added to it in a single history state.
+    """
+    rows = fit_datasets(
+        equation,
+        [
+            (item_.get_name(), item_.props.xdata, item_.props.ydata)
+            for item_ in items if isinstance(item_, DataItem)
+        ],
+        **kwargs,
+    )
+    if data is not None:
+        add_fitted_items(data, rows)
+    return rows
+
+
+def add_fitted_items(data, rows: list) -> None:
+    """Add the fitted equations of successful fits to data."""
+    style = data.get_selected_style_params()
+    items = [
+        EquationItem.new(
+            style,
+            row["equation"],
+            name=_("Fit of {name}").format(name=row["name"]),
+        ) for row in rows if row["equation"] is not None
+    ]
+    if items:
+        data.add_items(items)
+
+
+def format_table(rows: list) -> str:
+    """Format fit results as tab separated table."""
+    free_variables = next(
+        (list(row["parameters"]) for row in rows if row["equation"]), [],
+    )
+    lines = ["\t".join(
+        [_("Name")]
+        + [f"{var}\tσ({var})" for var in free_variables]
+        + ["R²"],
+    )]
+    for row in rows:
+        if row["equation"] is None:
+            lines.append(row["name"] + "\t" + _("Fit failed"))
+            continue
+        lines.append("\t".join(
+            [row["name"]]
+            + [
+                f"{utilities.sig_fig_round(row['parameters'][var], 3)}\t"
+                f"{utilities.sig_fig_round(row['sigmas'][var], 3)}"
+                for var in free_variables
+            ]
+            + [str(utilities.sig_fig_round(row["r2"], 3))],
+        ))
+    return "\n".join(lines)
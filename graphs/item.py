@@ -8,6 +8,22 @@ from graphs import misc, utilities
 
 from matplotlib import rcParams
 
+import numpy
+
+
+def _to_array(data) -> numpy.ndarray:
+    """
+    Convert data to a read-only contiguous float64 array.
+
+    Arrays are shared with the undo history, so they must never be changed in
+    place. Assign a modified copy instead.
+    """
+    if data is None:
+        data = numpy.empty(0)
+    array = numpy.ascontiguousarray(data, dtype=float).view()
+    array.flags.writeable = False
+    return array
+
 
 def new_from_dict(dictionary: dict):
     """Instanciate item from dict."""
@@ -68,8 +84,6 @@ class DataItem(_PythonItem):
     __gtype_name__ = "GraphsDataItem"
     _typename = _("Dataset")
 
-    xdata = GObject.Property(type=object)
-    ydata = GObject.Property(type=object)
     linestyle = GObject.Property(type=int, default=1)
     linewidth = GObject.Property(type=float, default=3)
     markerstyle = GObject.Property(type=int, default=0)
@@ -93,10 +107,48 @@ class DataItem(_PythonItem):
         )
 
     def __init__(self, **kwargs):
+        self._xdata, self._ydata = numpy.empty(0), numpy.empty(0)
+        self._sorted = True
+        self._extents = {}
         super().__init__(**kwargs)
-        for prop in ("xdata", "ydata"):
-            if self.get_property(prop) is None:
-                self.set_property(prop, [])
+
+    @GObject.Property(type=object)
+    def xdata(self) -> numpy.ndarray:
+        """X-values as contiguous float64 array."""
+        return self._xdata
+
+    @xdata.setter
+    def xdata(self, xdata) -> None:
+        self._xdata = _to_array(xdata)
+        self._sorted = bool(numpy.all(self._xdata[1:] >= self._xdata[:-1]))
+        self._extents.pop("xdata", None)
+
+    @GObject.Property(type=object)
+    def ydata(self) -> numpy.ndarray:
+        """Y-values as contiguous float64 array."""
+        return self._ydata
+
+    @ydata.setter
+    def ydata(self, ydata) -> None:
+        self._ydata = _to_array(ydata)
+        self._extents.pop("ydata", None)
+
+    def is_sorted(self) -> bool:
+        """Whether xdata is monotonically increasing and contains no NaN."""
+        return self._sorted
+
+    def get_extents(self, prop: str) -> tuple:
+        """
+        Get the extents of xdata or ydata, see `utilities.get_extents`.
+
+        Extents are computed once for every assigned array.
+        """
+        try:
+            return self._extents[prop]
+        except KeyError:
+            extents = utilities.get_extents(self.get_property(prop))
+            self._extents[prop] = extents
+            return extents
 
 
 class GeneratedDataItem(DataItem):
@@ -1,12 +1,14 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """Module for data transformations."""
+import concurrent.futures
 import logging
 import re
+import threading
 from gettext import gettext as _
 
-from gi.repository import Gio, Graphs
+from gi.repository import GLib, Gio, Graphs
 
-from graphs import misc, scales, utilities
+from graphs import misc, profiling, scales, utilities
 from graphs.item import DataItem, EquationItem
 
 import numexpr
@@ -42,36 +44,110 @@ def perform_operation(application: Graphs.Application, name: str) -> None:
             window.add_toast_string(str(error))
             return
 
+    if not hasattr(CommonOperations, name):
+        execute_selected(window, name, interaction_mode, *args)
+        return
+    data = window.get_data()
+    old_limits = data.get_figure_settings().get_limits()
+    if getattr(CommonOperations, name)(window):
+        data.optimize_limits()
+        data.add_history_state_with_limits(old_limits)
+
+
+def execute_selected(
+    window: Graphs.Window,
+    name: str,
+    interaction_mode: int,
+    *args,
+    fail_message: str = None,
+) -> None:
+    """
+    Execute an operation on all selected items.
+
+    The operation is computed for all data items in a thread pool. Results
+    are applied on the main loop in one batch, followed by a single history
+    state. Items that changed in the meantime are left untouched, which is
+    reported in a toast. If given, fail_message is shown instead of the
+    messages of failed operations.
+    """
     data = window.get_data()
     figure_settings = data.get_figure_settings()
     old_limits = figure_settings.get_limits()
+    items = [
+        item for item in data if item.get_selected()
+        and isinstance(item, (EquationItem, DataItem))
+    ]
+    data_items = [item for item in items if isinstance(item, DataItem)]
+    tasks = [
+        (
+            item,
+            item.props.xdata,
+            item.props.ydata,
+            DataOperations.get_selection(
+                item, figure_settings, interaction_mode,
+            ),
+        ) for item in data_items
+    ]
+
+    def failed_result(error: Exception) -> tuple:
+        message = _("{name}: Error performing the operation")
+        return None, message.format(name=error.__class__.__name__)
 
-    if hasattr(CommonOperations, name):
-        all_success = getattr(CommonOperations, name)(window)
-    else:
+    def compute(task):
+        item, _xdata, _ydata, selection = task
+        # Unexpected errors of a single item are reported like failed
+        # operations, so the results of other items are still applied
+        try:
+            return DataOperations.compute(item, selection, name, *args)
+        except Exception as error:  # noqa: PIE786
+            logging.exception("Could not compute %s", name)
+            return failed_result(error)
+
+    def worker():
+        # on_done must always run, as it applies the equation items
+        try:
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                results = list(executor.map(compute, tasks))
+        except Exception as error:  # noqa: PIE786
+            logging.exception("Could not compute %s", name)
+            results = [failed_result(error)] * len(tasks)
+        GLib.idle_add(on_done, results)
+
+    def on_done(results):
+        skipped = False
         all_success = False
-        for item in data:
-            if not item.get_selected():
-                continue
+        messages = []
+        for item in items:
             if isinstance(item, EquationItem):
-                operations_class = EquationOperations
-            elif isinstance(item, DataItem):
-                operations_class = DataOperations
-            else:
+                success, message = EquationOperations.execute(
+                    item, name, figure_settings, interaction_mode, *args,
+                )
+                all_success = success or all_success
+                messages.append((success, message))
+        for (item, xdata, ydata, selection), result in zip(tasks, results):
+            if item.props.xdata is not xdata or item.props.ydata is not ydata:
+                skipped = True
                 continue
-            success, message = operations_class.execute(
-                item,
-                name,
-                figure_settings,
-                interaction_mode,
-                *args,
+            success, message = DataOperations.apply(
+                item, selection, result, interaction_mode,
             )
-            if message:
-                window.add_toast_string(message)
             all_success = success or all_success
-    if all_success:
-        data.optimize_limits()
-        data.add_history_state_with_limits(old_limits)
+            messages.append((success, message))
+        for message in dict.fromkeys(
+            message if success or fail_message is None else fail_message
+            for success, message in messages if message
+        ):
+            window.add_toast_string(message)
+        if skipped:
+            window.add_toast_string(
+                _("Items that changed during the operation were skipped"),
+            )
+        if all_success:
+            data.optimize_limits()
+            data.add_history_state_with_limits(old_limits)
+        return GLib.SOURCE_REMOVE
+
+    threading.Thread(target=worker, daemon=True).start()
 
 
 class DataHelper():
@@ -82,26 +158,46 @@ class DataHelper():
         interaction_mode: int,
         selected_limits: tuple[float, float],
         item: DataItem,
-    ) -> tuple[list[float], list[float]]:
-        """Get the X and Y data of a DataItem."""
+    ) -> tuple[numpy.ndarray, numpy.ndarray, slice | numpy.ndarray]:
+        """
+        Get the X and Y data of a DataItem.
+
+        Also returns the indices of the selected data in the item, either as
+        slice or as index array, so results can be written back in place.
+        """
         xdata = item.props.xdata
         ydata = item.props.ydata
-        if interaction_mode == 2:
-            startx, stopx = selected_limits
-            # If startx and stopx are not out of range, that is,
-            # if the item data is within the highlight
-            xmin = min(xdata)
-            if not (startx < xmin and stopx < xmin or (startx > max(xdata))):
-                xdata, ydata = DataHelper.filter_data(
-                    xdata, ydata, ">=", startx,
-                )
-                xdata, ydata = DataHelper.filter_data(
-                    xdata, ydata, "<=", stopx,
-                )
-            else:
-                xdata = None
-                ydata = None
-        return xdata, ydata
+        if interaction_mode != 2:
+            return xdata, ydata, slice(None)
+        startx, stopx = selected_limits
+        is_sorted = item.is_sorted()
+        # If startx and stopx are not out of range, that is,
+        # if the item data is within the highlight
+        xmin = xdata[0] if is_sorted else xdata.min()
+        xmax = xdata[-1] if is_sorted else xdata.max()
+        if startx < xmin and stopx < xmin or startx > xmax:
+            return None, None, None
+        indices = DataHelper.get_range_indices(xdata, startx, stopx, is_sorted)
+        return xdata[indices], ydata[indices], indices
+
+    @staticmethod
+    def get_range_indices(
+        xdata: numpy.ndarray,
+        startx: float,
+        stopx: float,
+        is_sorted: bool = False,
+    ) -> slice | numpy.ndarray:
+        """
+        Get the indices of the data with startx <= x <= stopx.
+
+        Sorted data is searched with a binary search and results in a slice,
+        which gives views instead of copies when indexing.
+        """
+        if is_sorted:
+            start = numpy.searchsorted(xdata, startx, side="left")
+            stop = numpy.searchsorted(xdata, stopx, side="right")
+            return slice(int(start), int(stop))
+        return numpy.flatnonzero((xdata >= startx) & (xdata <= stopx))
 
     @staticmethod
     def get_selected_limits(
@@ -152,14 +248,14 @@ class DataHelper():
 
     @staticmethod
     def filter_data(
-        xdata: list,
-        ydata: list,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
         condition: str,
         value: float,
-    ) -> list:
+    ) -> tuple[numpy.ndarray, numpy.ndarray]:
         """Filter coordinates based on the given condition."""
-        xdata = numpy.array(xdata)
-        ydata = numpy.array(ydata)
+        xdata = numpy.asarray(xdata)
+        ydata = numpy.asarray(ydata)
 
         conditions = {
             "<=": numpy.less_equal,
@@ -168,54 +264,29 @@ class DataHelper():
         }
         mask = conditions[condition](xdata, value)
 
-        xdata_filtered = xdata[mask]
-        ydata_filtered = ydata[mask]
-
-        return list(xdata_filtered), list(ydata_filtered)
-
-    @staticmethod
-    def create_data_mask(
-        xdata1: list,
-        ydata1: list,
-        xdata2: list,
-        ydata2: list,
-    ) -> bool:
-        """
-        Create a mask for matching pairs of coordinates.
-
-        Returns:
-        - Boolean mask indicating where pairs of coordinates match.
-        """
-        xdata1, ydata1, xdata2, ydata2 = \
-            map(numpy.array, [xdata1, ydata1, xdata2, ydata2])
-        return numpy.any((xdata1[:, None] == xdata2)
-                         & (ydata1[:, None] == ydata2),
-                         axis=1)
+        return xdata[mask], ydata[mask]
 
     @staticmethod
-    def sort_data(xdata: list, ydata: list) -> (list, list):
+    def sort_data(
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
+    ) -> (numpy.ndarray, numpy.ndarray):
         """Sort data."""
-        return map(
-            list,
-            zip(
-                *sorted(
-                    zip(xdata, ydata),
-                    key=lambda x_values: x_values[0],
-                ),
-            ),
-        )
+        xdata, ydata = numpy.asarray(xdata), numpy.asarray(ydata)
+        indices = numpy.argsort(xdata, kind="stable")
+        return xdata[indices], ydata[indices]
 
     @staticmethod
-    def filter_range(xdata, ydata, prev_xdata, prev_ydata):
+    def filter_range(
+        xdata, ydata, prev_xdata, prev_ydata, prev_sorted=False,
+    ):
         """Filter range."""
-        if min(xdata) >= min(prev_xdata) and max(xdata) <= max(prev_ydata):
-            new_xdata, new_ydata = DataHelper.filter_data(
-                prev_xdata, prev_ydata, ">=", min(xdata),
+        xmin, xmax = xdata.min(), xdata.max()
+        if xmin >= prev_xdata.min() and xmax <= prev_ydata.max():
+            indices = DataHelper.get_range_indices(
+                prev_xdata, xmin, xmax, prev_sorted,
             )
-            new_xdata, new_ydata = DataHelper.filter_data(
-                new_xdata, new_ydata, "<=", max(xdata),
-            )
-            return new_xdata, new_ydata
+            return prev_xdata[indices], prev_ydata[indices]
         return xdata, ydata
 
 
@@ -227,37 +298,18 @@ class CommonOperations():
         """Perform a custom operation on the dataset."""
 
         def on_accept(_dialog, input_x, input_y, discard):
-            data = window.get_data()
-            figure_settings = data.get_figure_settings()
-            interaction_mode = window.get_canvas().get_mode()
-            old_limits = figure_settings.get_limits()
-
-            for item in data:
-                if not item.get_selected():
-                    continue
-                if isinstance(item, EquationItem):
-                    operations_class = EquationOperations
-                elif isinstance(item, DataItem):
-                    operations_class = DataOperations
-                success, message = operations_class.execute(
-                    item,
-                    "transform",
-                    figure_settings,
-                    interaction_mode,
-                    input_x,
-                    input_y,
-                    discard,
-                )
-                if message:
-                    fail_message = _(
-                        "Unable to perform transformation, "
-                        "make sure the syntax is correct",
-                    )
-                    toast = message if success else fail_message
-                    window.add_toast_string(toast)
-
-                data.optimize_limits()
-                data.add_history_state_with_limits(old_limits)
+            execute_selected(
+                window,
+                "transform",
+                window.get_canvas().get_mode(),
+                input_x,
+                input_y,
+                discard,
+                fail_message=_(
+                    "Unable to perform transformation, "
+                    "make sure the syntax is correct",
+                ),
+            )
 
         dialog = Graphs.TransformDialog.new(window)
         dialog.connect("accept", on_accept)
@@ -272,7 +324,6 @@ class CommonOperations():
         for item in data:
             if not item.get_selected():
                 continue
-            xdata, ydata = [], []
             selected_limits = DataHelper.get_selected_limits(
                 data.get_figure_settings(),
                 interaction_mode,
@@ -282,16 +333,18 @@ class CommonOperations():
                 xdata, ydata = \
                     utilities.equation_to_data(item._equation, selected_limits)
             elif isinstance(item, DataItem):
-                xdata, ydata = DataHelper().get_xydata(
+                xdata, ydata, _indices = DataHelper.get_xydata(
                     interaction_mode, selected_limits, item,
                 )
             else:
                 continue
             if xdata is not None and ydata is not None:
-                new_xdata.extend(xdata)
-                new_ydata.extend(ydata)
+                new_xdata.append(xdata)
+                new_ydata.append(ydata)
 
-        if (not new_xdata) or (not new_ydata):
+        new_xdata = numpy.concatenate(new_xdata) if new_xdata else []
+        new_ydata = numpy.concatenate(new_ydata) if new_ydata else []
+        if len(new_xdata) == 0 or len(new_ydata) == 0:
             window.add_toast_string(
                 _("No data found within the highlighted area"),
             )
@@ -337,10 +390,10 @@ class CommonOperations():
                     item.props.equation, selected_limits,
                 )
             elif isinstance(item, DataItem):
-                xdata, ydata = DataHelper().get_xydata(
+                xdata, ydata, indices = DataHelper.get_xydata(
                     interaction_mode, selected_limits, item,
                 )
-            if (not xdata) or (not ydata):
+            if xdata is None or len(xdata) == 0 or len(ydata) == 0:
                 continue
 
             shift_value = 0
@@ -355,18 +408,21 @@ class CommonOperations():
                     prev_xdata, prev_ydata = utilities.equation_to_data(
                         previous_item.props.equation, selected_limits,
                     )
+                    prev_sorted = True
                 else:
                     prev_xdata, prev_ydata = \
                         previous_item.props.xdata, previous_item.props.ydata
+                    prev_sorted = previous_item.is_sorted()
 
                 new_ydata = DataHelper.filter_range(
                     xdata,
                     ydata,
                     prev_xdata,
                     prev_ydata,
+                    prev_sorted,
                 )[1]
-                ymin = min(x for x in new_ydata if x != 0)
-                ymax = max(x for x in new_ydata if x != 0)
+                nonzero_ydata = new_ydata[new_ydata != 0]
+                ymin, ymax = nonzero_ydata.min(), nonzero_ydata.max()
 
                 if scale == scales.Scale.LOG:
                     shift_value += \
@@ -388,27 +444,21 @@ class CommonOperations():
                 else:
                     equation = f"{item.equation}+{shift_value}"
                 equation = utilities.preprocess(equation)
-                equation = str(sympy.simplify(equation))
+                with profiling.section("sympy.simplify"):
+                    equation = str(sympy.simplify(equation))
                 item.props.equation = utilities.prettify_equation(equation)
                 continue
             if isinstance(item, DataItem):
                 if scale == scales.Scale.LOG:
-                    new_ydata = [value * 10**shift_value for value in ydata]
+                    new_ydata = ydata * 10**shift_value
                 elif scale == scales.Scale.LOG2:
-                    new_ydata = [value * 2**shift_value for value in ydata]
+                    new_ydata = ydata * 2**shift_value
                 else:  # Apply linear scaling
-                    new_ydata = [value + shift_value for value in ydata]
-                i = 0
-                for index, masked in enumerate(DataHelper.create_data_mask(
-                    item.props.xdata, item.props.ydata, xdata, ydata,
-                )):
-                    # Change coordinates that were within span
-                    if masked:
-                        item.props.xdata[index] = xdata[i]
-                        item.props.ydata[index] = new_ydata[i]
-                        i += 1
-                item.notify("xdata")
-                item.notify("ydata")
+                    new_ydata = ydata + shift_value
+                # Change coordinates that were within span
+                item_ydata = item.props.ydata.copy()
+                item_ydata[indices] = new_ydata
+                item.props.ydata = item_ydata
                 continue
         return True
 
@@ -442,7 +492,8 @@ class EquationOperations():
                         " did not result in a plottable equation",
                     ),
                 )
-            equation = str(sympy.simplify(equation))
+            with profiling.section("sympy.simplify"):
+                equation = str(sympy.simplify(equation))
             item.props.equation = utilities.prettify_equation(equation)
         except misc.InvalidEquationError as error:
             return False, error.message
@@ -510,8 +561,7 @@ class EquationOperations():
             # If we don't manage to solve this analytically, just find
             # the maximum by calculating
             except TypeError:
-                middle_index = ydata.index(max(ydata))
-                middle_value = xdata[middle_index]
+                middle_value = xdata[numpy.argmax(ydata)]
 
         elif center_maximum == 1:  # Center at middle
             middle_value = (min(xdata) + max(xdata)) / 2
@@ -560,10 +610,10 @@ class EquationOperations():
         local_dict = {
             "x": xdata,
             "y": ydata,
-            "x_min": min(xdata),
-            "x_max": max(xdata),
-            "y_min": min(ydata),
-            "y_max": max(ydata),
+            "x_min": xdata.min(),
+            "x_max": xdata.max(),
+            "y_min": ydata.min(),
+            "y_max": ydata.max(),
         }
 
         for key, value in local_dict.items():
@@ -575,7 +625,7 @@ class EquationOperations():
         return input_y.lower().replace("y", equation)
 
 
-_return = (list[float], list[float], bool, bool)
+_return = (numpy.ndarray, numpy.ndarray, bool, bool)
 
 
 class DataOperations():
@@ -590,70 +640,96 @@ class DataOperations():
         *args,
     ) -> tuple[bool, str]:
         """Execute the operation on the given item."""
+        selection = DataOperations.get_selection(
+            item, figure_settings, interaction_mode,
+        )
+        result = DataOperations.compute(item, selection, name, *args)
+        return DataOperations.apply(item, selection, result, interaction_mode)
+
+    @staticmethod
+    def get_selection(
+        item: DataItem,
+        figure_settings: Graphs.FigureSettings,
+        interaction_mode: int,
+    ) -> tuple:
+        """Get the selected data and its indices, see `get_xydata`."""
         selected_limits = DataHelper.get_selected_limits(
             figure_settings,
             interaction_mode,
             item,
         )
-        xdata, ydata = DataHelper.get_xydata(
-            interaction_mode, selected_limits, item,
-        )
+        return DataHelper.get_xydata(interaction_mode, selected_limits, item)
+
+    @staticmethod
+    def compute(item: DataItem, selection: tuple, name: str, *args) -> tuple:
+        """
+        Compute the operation on the selected data.
+
+        Does not change the item, so it can run outside of the main thread.
+        Returns the result of the operation, or None and an error message.
+        """
+        xdata, ydata, _indices = selection
         try:
             callback = getattr(DataOperations, name)
             if not (xdata is not None and len(xdata) != 0):
-                return False, _("No data found within the highlighted area")
-            message = ""
-            new_xdata, new_ydata, sort, discard = callback(
-                item, xdata, ydata, *args,
-            )
+                return None, _("No data found within the highlighted area")
+            with profiling.section(f"DataOperations.{name}", len(xdata)):
+                return callback(item, xdata, ydata, *args), ""
         except NotImplementedError:
-            return False, _("Operation not supported for data items")
+            return None, _("Operation not supported for data items")
         # May run into this exception for custom transformations:
         except (RuntimeError, ValueError, KeyError, SyntaxError) as exception:
             message = _("{name}: Error performing the operation")
-            return False, message.format(name=exception.__class__.__name__)
-        new_xdata, new_ydata = list(new_xdata), list(new_ydata)
+            return None, message.format(name=exception.__class__.__name__)
+
+    @staticmethod
+    def apply(
+        item: DataItem,
+        selection: tuple,
+        result: tuple,
+        interaction_mode: int,
+    ) -> tuple[bool, str]:
+        """Write the result of `compute` back to the item."""
+        result, message = result
+        if result is None:
+            return False, message
+        new_xdata, new_ydata, sort, discard = result
+        indices = selection[2]
         if discard and interaction_mode == 2:
             logging.debug("Discard is true")
             message = _(
                 "Data that was outside of the highlighted area has"
                 " been discarded",
             )
-            item.props.xdata = new_xdata
-            item.props.ydata = new_ydata
+            item_xdata, item_ydata = new_xdata, new_ydata
         else:
             logging.debug("Discard is false")
-            mask = DataHelper.create_data_mask(
-                item.props.xdata,
-                item.props.ydata,
-                xdata,
-                ydata,
-            )
-            if new_xdata == []:  # If cut action was performed
-                remove_list = \
-                    [index for index, masked in enumerate(mask) if masked]
-                for index in sorted(remove_list, reverse=True):
-                    item.props.xdata.pop(index)
-                    item.props.ydata.pop(index)
+            if len(new_xdata) == 0:  # If cut action was performed
+                item_xdata = numpy.delete(item.props.xdata, indices)
+                item_ydata = numpy.delete(item.props.ydata, indices)
             else:
-                i = 0
-                for index, masked in enumerate(mask):
-                    # Change coordinates that were within span
-                    if masked:
-                        item.props.xdata[index] = new_xdata[i]
-                        item.props.ydata[index] = new_ydata[i]
-                        i += 1
+                # Change coordinates that were within span
+                item_xdata = item.props.xdata.copy()
+                item_ydata = item.props.ydata.copy()
+                item_xdata[indices] = new_xdata
+                item_ydata[indices] = new_ydata
         if sort:
             logging.debug("Sorting data")
-            item.props.xdata, item.props.ydata = DataHelper.sort_data(
-                item.props.xdata, item.props.ydata,
+            item_xdata, item_ydata = DataHelper.sort_data(
+                item_xdata, item_ydata,
             )
-        item.notify("xdata")
-        item.notify("ydata")
+        with item.freeze_notify():
+            item.props.xdata = item_xdata
+            item.props.ydata = item_ydata
         return True, message
 
     @staticmethod
-    def translate_x(_item, xdata: list, ydata: list, offset: float) -> _return:
+    def translate_x(
+        _item,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
+        offset: float,
+    ) -> _return:
         """
         Translate all selected data on the x-axis.
 
@@ -662,10 +738,15 @@ class DataOperations():
         Will show a toast if a ValueError is raised, typically when a user
         entered an invalid number (e.g. comma instead of point separators)
         """
-        return [value + offset for value in xdata], ydata, True, False
+        return xdata + offset, ydata, True, False
 
     @staticmethod
-    def translate_y(_item, xdata: list, ydata: list, offset: float) -> _return:
+    def translate_y(
+        _item,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
+        offset: float,
+    ) -> _return:
         """
         Translate all selected data on the y-axis.
 
@@ -674,13 +755,13 @@ class DataOperations():
         Will show a toast if a ValueError is raised, typically when a user
         entered an invalid number (e.g. comma instead of point separators)
         """
-        return xdata, [value + offset for value in ydata], False, False
+        return xdata, ydata + offset, False, False
 
     @staticmethod
     def multiply_x(
         _item,
-        xdata: list,
-        ydata: list,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
         multiplier: float,
     ) -> _return:
         """
@@ -691,13 +772,13 @@ class DataOperations():
         Will show a toast if a ValueError is raised, typically when a user
         entered an invalid number (e.g. comma instead of point separators)
         """
-        return [value * multiplier for value in xdata], ydata, True, False
+        return xdata * multiplier, ydata, True, False
 
     @staticmethod
     def multiply_y(
         _item,
-        xdata: list,
-        ydata: list,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
         multiplier: float,
     ) -> _return:
         """
@@ -708,18 +789,22 @@ class DataOperations():
         Will show a toast if a ValueError is raised, typically when a user
         entered an invalid number (e.g. comma instead of point separators)
         """
-        return xdata, [value * multiplier for value in ydata], False, False
+        return xdata, ydata * multiplier, False, False
 
     @staticmethod
-    def normalize(_item, xdata: list, ydata: list) -> _return:
+    def normalize(
+        _item,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
+    ) -> _return:
         """Normalize all selected data."""
-        return xdata, [value / max(ydata) for value in ydata], False, False
+        return xdata, ydata / ydata.max(), False, False
 
     @staticmethod
     def smoothen(
         _item,
-        xdata: list,
-        ydata: list,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
         smooth_type: int,
         settings: Gio.Settings,
     ) -> _return:
@@ -742,8 +827,8 @@ class DataOperations():
     @staticmethod
     def center(
         _item,
-        xdata: list,
-        ydata: list,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
         center_maximum: int,
     ) -> _return:
         """
@@ -753,63 +838,66 @@ class DataOperations():
         on the maximum value of the data
         """
         if center_maximum == 0:  # Center at maximum Y
-            middle_index = ydata.index(max(ydata))
-            middle_value = xdata[middle_index]
+            middle_value = xdata[numpy.argmax(ydata)]
         elif center_maximum == 1:  # Center at middle
-            middle_value = (min(xdata) + max(xdata)) / 2
-        new_xdata = [coordinate - middle_value for coordinate in xdata]
-        return new_xdata, ydata, True, False
+            middle_value = (xdata.min() + xdata.max()) / 2
+        return xdata - middle_value, ydata, True, False
 
     @staticmethod
     def cut(_item, _xdata, _ydata) -> _return:
         """Cut selected data over the span that is selected."""
-        return [], [], False, False
+        return numpy.empty(0), numpy.empty(0), False, False
 
     @staticmethod
-    def derivative(_item, xdata: list, ydata: list) -> _return:
+    def derivative(
+        _item,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
+    ) -> _return:
         """Calculate derivative of all selected data."""
-        x_values = numpy.array(xdata)
-        y_values = numpy.array(ydata)
-        dy_dx = numpy.gradient(y_values, x_values)
-        return xdata, dy_dx.tolist(), False, True
+        return xdata, numpy.gradient(ydata, xdata), False, True
 
     @staticmethod
-    def integral(_item, xdata: list, ydata: list) -> _return:
+    def integral(
+        _item,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
+    ) -> _return:
         """Calculate indefinite integral of all selected data."""
-        x_values = numpy.array(xdata)
-        y_values = numpy.array(ydata)
         indefinite_integral = scipy.integrate.cumulative_trapezoid(
-            y_values,
-            x_values,
+            ydata,
+            xdata,
             initial=0,
-        ).tolist()
+        )
         return xdata, indefinite_integral, False, True
 
     @staticmethod
-    def fft(_item, xdata: list, ydata: list) -> _return:
+    def fft(
+        _item,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
+    ) -> _return:
         """Perform Fourier transformation on all selected data."""
-        x_values = numpy.array(xdata)
-        y_values = numpy.array(ydata)
-        y_fourier = numpy.fft.fft(y_values)
-        x_fourier = numpy.fft.fftfreq(len(x_values), x_values[1] - x_values[0])
-        y_fourier = [value.real for value in y_fourier]
-        return x_fourier, y_fourier, False, True
+        y_fourier = numpy.fft.fft(ydata)
+        x_fourier = numpy.fft.fftfreq(len(xdata), xdata[1] - xdata[0])
+        return x_fourier, y_fourier.real, False, True
 
     @staticmethod
-    def inverse_fft(_item, xdata: list, ydata: list) -> _return:
+    def inverse_fft(
+        _item,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
+    ) -> _return:
         """Perform Inverse Fourier transformation on all selected data."""
-        x_values = numpy.array(xdata)
-        y_values = numpy.array(ydata)
-        y_fourier = numpy.fft.ifft(y_values)
-        x_fourier = numpy.fft.fftfreq(len(x_values), x_values[1] - x_values[0])
-        y_fourier = [value.real for value in y_fourier]
-        return x_fourier, y_fourier, False, True
+        y_fourier = numpy.fft.ifft(ydata)
+        x_fourier = numpy.fft.fftfreq(len(xdata), xdata[1] - xdata[0])
+        return x_fourier, y_fourier.real, False, True
 
     @staticmethod
     def transform(
         _item,
-        xdata: list,
-        ydata: list,
+        xdata: numpy.ndarray,
+        ydata: numpy.ndarray,
         input_x: str,
         input_y: str,
         discard: bool = False,
@@ -818,22 +906,25 @@ class DataOperations():
         local_dict = {
             "x": xdata,
             "y": ydata,
-            "x_min": min(xdata),
-            "x_max": max(xdata),
-            "y_min": min(ydata),
-            "y_max": max(ydata),
+            "x_min": xdata.min(),
+            "x_max": xdata.max(),
+            "y_min": ydata.min(),
+            "y_max": ydata.max(),
         }
         # Add array of zeros to return values, such that output remains a list
         # of the correct size, even when a float is given as input.
-        return (
-            numexpr.evaluate(
+        with profiling.section("numexpr.evaluate", 2 * len(xdata)):
+            new_xdata = numexpr.evaluate(
                 utilities.preprocess(input_x) + "+ 0*x",
                 local_dict,
-            ),
-            numexpr.evaluate(
+            )
+            new_ydata = numexpr.evaluate(
                 utilities.preprocess(input_y) + "+ 0*y",
                 local_dict,
-            ),
+            )
+        return (
+            new_xdata,
+            new_ydata,
             True,
             discard,
         )
@@ -1,63 +1,146 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """Module for parsing files to usable data."""
+import contextlib
+import io
+import itertools
 import re
+from collections.abc import Iterator
 from gettext import gettext as _
+from xml.etree import ElementTree
 
 from gi.repository import Gio, Graphs
 
 import gio_pyio
 
-from graphs import file_io, item, misc, project, utilities
+from graphs import item, misc, profiling, project, utilities
 from graphs.misc import ParseError
 
 import numpy
 
 
+@profiling.timed(size=profiling.count_points)
 def import_from_project(_params, _style, file: Gio.File) -> misc.ItemList:
     """Import data from project file."""
     project_dict = project.read_project_file(file)
     return list(map(item.new_from_dict, project_dict["data"]))
 
 
+def _xrdml_tag(element) -> str:
+    """Get the tag of an xrdml element without its namespace."""
+    return element.tag.rpartition("}")[2]
+
+
+def _xrdml_values(element) -> numpy.ndarray:
+    """Convert a whitespace separated block of numbers to an array."""
+    return numpy.fromstring(element.text or "", sep=" ")
+
+
+def _xrdml_positions(element, length: int) -> numpy.ndarray:
+    """Get the positions of an axis from a positions element."""
+    positions = {_xrdml_tag(child): child for child in element}
+    if "listPositions" in positions:
+        return _xrdml_values(positions["listPositions"])
+    if "startPosition" in positions and "endPosition" in positions:
+        return numpy.linspace(
+            float(positions["startPosition"].text),
+            float(positions["endPosition"].text),
+            length,
+        )
+    return None
+
+
+def _parse_xrdml_data_points(element, scan_axis: str) -> tuple:
+    """
+    Parse a dataPoints element to xdata, ydata, axis and unit.
+
+    The x-axis is the axis the scan axis starts with, e.g. 2Theta for a
+    2Theta-Omega scan, falling back to the first axis that is not constant.
+    """
+    positions, ydata, counting_time = [], None, 1
+    for child in element:
+        tag = _xrdml_tag(child)
+        if tag == "positions":
+            positions.append(child)
+        elif tag == "commonCountingTime":
+            counting_time = float(child.text)
+        elif tag == "countingTimes":
+            counting_time = _xrdml_values(child)
+        elif tag in ("intensities", "counts") and ydata is None:
+            ydata = _xrdml_values(child)
+    if ydata is None:
+        raise ParseError(_("No intensities found in xrdml file"))
+    axes = []
+    for position in positions:
+        xdata = _xrdml_positions(position, len(ydata))
+        if xdata is not None and len(xdata) == len(ydata):
+            axes.append((position.get("axis"), position.get("unit"), xdata))
+    scan = next(
+        (scan for scan in axes if scan_axis.startswith(scan[0])),
+        next((
+            scan for scan in axes
+            if len(scan[2]) > 1 and scan[2][0] != scan[2][-1]
+        ), None),
+    )
+    if scan is None:
+        raise ParseError(_("No scan axis found in xrdml file"))
+    axis, unit, xdata = scan
+    return xdata, ydata / counting_time, axis, unit
+
+
+def _iter_xrdml(stream) -> Iterator[tuple]:
+    """
+    Incrementally parse an xrdml stream.
+
+    Yields xdata, ydata, axis and unit for every dataPoints element. Scans
+    are removed from their parent once parsed, so that the document is never
+    kept in memory.
+    """
+    parents = []
+    scan_axis = ""
+    for event, element in ElementTree.iterparse(
+        stream, events=("start", "end"),
+    ):
+        tag = _xrdml_tag(element)
+        if event == "start":
+            parents.append(element)
+            if tag == "scan":
+                scan_axis = element.get("scanAxis", "")
+            continue
+        parents.pop()
+        if tag == "dataPoints":
+            try:
+                data_points = _parse_xrdml_data_points(element, scan_axis)
+            except (TypeError, ValueError) as error:
+                raise ParseError(
+                    _("Invalid data points in xrdml file"),
+                ) from error
+            yield data_points
+        elif tag == "scan" and parents:
+            parents[-1].remove(element)
+
+
+@profiling.timed(size=profiling.count_points)
 def import_from_xrdml(_params, style, file: Gio.File) -> misc.ItemList:
-    """Import data from xrdml file."""
-    content = file_io.parse_xml(file)
-    intensities = content.getElementsByTagName("intensities")
-    counting_time = content.getElementsByTagName("commonCountingTime")
-    counting_time = float(counting_time[0].firstChild.data)
-    ydata = intensities[0].firstChild.data.split()
-    ydata = [int(value) / counting_time for value in ydata]
-
-    scan_type = content.getElementsByTagName("scan")
-    scan_axis = scan_type[0].attributes["scanAxis"].value
-    if scan_axis.startswith("2Theta"):
-        scan_axis = "2Theta"
-    if scan_axis.startswith("Omega"):
-        scan_axis = "Omega"
-
-    data_points = content.getElementsByTagName("positions")
-    for position in data_points:
-        axis = position.attributes["axis"]
-        if axis.value == scan_axis:
-            unit = position.attributes["unit"].value
-            start_pos = position.getElementsByTagName("startPosition")
-            end_pos = position.getElementsByTagName("endPosition")
-            start_pos = float(start_pos[0].firstChild.data)
-            end_pos = float(end_pos[0].firstChild.data)
-            xdata = numpy.linspace(start_pos, end_pos, len(ydata))
-            xdata = numpy.ndarray.tolist(xdata)
+    """Import every scan of an xrdml file as a separate item."""
+    with gio_pyio.open(file, "rb") as wrapper:
+        try:
+            scans = list(_iter_xrdml(wrapper))
+        except ElementTree.ParseError as error:
+            raise ParseError(_("Invalid xrdml file")) from error
+    name = Graphs.tools_get_filename(file)
     return [
         item.DataItem.new(
             style,
             xdata,
             ydata,
-            name=Graphs.tools_get_filename(file),
-            xlabel=f"{scan_axis} ({unit})",
+            name=name if len(scans) == 1 else f"{name} ({index})",
+            xlabel=f"{axis} ({unit})",
             ylabel=_("Intensity (cps)"),
-        ),
+        ) for index, (xdata, ydata, axis, unit) in enumerate(scans, 1)
     ]
 
 
+@profiling.timed(size=profiling.count_points)
 def import_from_xry(_params, style, file: Gio.File) -> misc.ItemList:
     """Import data from .xry files used by Leybold X-ray apparatus."""
     with gio_pyio.open(file, "rt", encoding="ISO-8859-1") as wrapper:
@@ -86,12 +169,17 @@ def import_from_xry(_params, style, file: Gio.File) -> misc.ItemList:
                 ylabel=_("R (1/s)"),
             ) for i in range(item_count)
         ]
+        xdata = [[] for _item in items]
+        ydata = [[] for _item in items]
         for _count in range(int(info[1])):
-            for value, item_ in zip(wrapper.readline().strip().split(), items):
-                if value != "NaN":
-                    item_.xdata.append(x_value)
-                    item_.ydata.append(float(value))
+            for index, value in enumerate(wrapper.readline().strip().split()):
+                if value != "NaN" and index < item_count:
+                    xdata[index].append(x_value)
+                    ydata[index].append(float(value))
             x_value += x_step
+        for item_, item_xdata, item_ydata in zip(items, xdata, ydata):
+            item_.props.xdata = item_xdata
+            item_.props.ydata = item_ydata
         skip(9 + item_count)
         for _count in range(int(wrapper.readline().strip())):
             values = wrapper.readline().strip().split()
@@ -109,65 +197,185 @@ def import_from_xry(_params, style, file: Gio.File) -> misc.ItemList:
 
 
 _PH = "dVldZaXqENhuPLPw"
+# Amount of lines handed to the vectorized parser at once. Blocks that fail to
+# parse are bisected until they are smaller than _MIN_BLOCK_SIZE, after which
+# the remaining lines are evaluated one by one.
+_BLOCK_SIZE = 65536
+_MIN_BLOCK_SIZE = 64
+# Delimiters that would otherwise match newlines when applied to a block
+_BLOCK_DELIMITERS = {misc.DELIMITERS["whitespace"]: r"[^\S\n]+"}
 
 
-def import_from_columns(params, style, file: Gio.File) -> misc.ItemList:
-    """Import data from columns file."""
-    item_ = item.DataItem.new(style, name=Graphs.tools_get_filename(file))
-    column_x = params.get_int("column-x")
-    column_y = params.get_int("column-y")
-    separator = params.get_string("separator").replace(" ", "")
-    skip_rows = params.get_int("skip-rows")
-    delimiter = misc.DELIMITERS[params.get_string("delimiter")]
-    if delimiter == "custom":
-        delimiter = params.get_string("custom-delimiter")
-    stream = Gio.DataInputStream.new(file.read(None))
-    start_values = False
-    for index, line in enumerate(stream, -skip_rows):
-        if index < 0:
-            continue
-        values = re.split(delimiter, line)
-        if separator == ",":
-            values = (
+class _ColumnsParser():
+    """
+    Chunked parser for the columns format.
+
+    Large blocks of lines are converted to float arrays at once using
+    `numpy.loadtxt`. Lines that do not consist of plain numbers are evaluated
+    using `utilities.string_to_float` instead.
+    """
+
+    def __init__(self, params):
+        self.column_x = params.get_int("column-x")
+        self.column_y = params.get_int("column-y")
+        self.separator = params.get_string("separator").replace(" ", "")
+        self.skip_rows = params.get_int("skip-rows")
+        delimiter = misc.DELIMITERS[params.get_string("delimiter")]
+        if delimiter == "custom":
+            delimiter = params.get_string("custom-delimiter")
+        self.delimiter = re.compile(delimiter)
+        block_delimiter = re.compile(
+            _BLOCK_DELIMITERS.get(delimiter, delimiter),
+        )
+        # Custom delimiters may match newlines, those are split per line
+        if block_delimiter.search("\n") is not None:
+            block_delimiter = None
+        self._block_delimiter = block_delimiter
+        self.xlabel, self.ylabel = None, None
+        self._xdata, self._ydata = [], []
+
+    def parse(self, stream) -> (numpy.ndarray, numpy.ndarray):
+        """Parse all lines from a text stream."""
+        index = -self.skip_rows
+        # Look for headers until the first line containing values
+        for index, line in enumerate(stream, -self.skip_rows):
+            if index < 0:
+                continue
+            line = line.rstrip("\n")
+            try:
+                self._append_line(line, index)
+                break
+            except ValueError:
+                self._parse_headers(line)
+        index += 1
+        while True:
+            lines = list(itertools.islice(stream, _BLOCK_SIZE))
+            if not lines:
+                break
+            lines = [line.rstrip("\n") for line in lines]
+            self._parse_block(lines, index)
+            index += len(lines)
+        if not self._xdata:
+            return numpy.empty(0), numpy.empty(0)
+        return numpy.concatenate(self._xdata), numpy.concatenate(self._ydata)
+
+    def _split(self, line: str) -> list[str]:
+        values = self.delimiter.split(line)
+        if self.separator == ",":
+            values = [
                 string.replace(",", _PH).replace(".", ", ").replace(_PH, ".")
                 for string in values
-            )
-        try:
-            if len(values) == 1:
-                float_value = utilities.string_to_float(values[0])
-                if float_value is not None:
-                    item_.ydata.append(float_value)
-                    item_.xdata.append(index)
-                    start_values = True
+            ]
+        return values
+
+    def _append_line(self, line: str, index: int) -> None:
+        """
+        Parse a single line using the expression evaluator.
+
+        Raises a ValueError if not all values in the line are floats.
+        """
+        values = self._split(line)
+        if len(values) == 1:
+            y_value = utilities.string_to_float(values[0])
+            if y_value is None:
+                raise ValueError
+            x_value = index
+        else:
+            try:
+                x_value = utilities.string_to_float(values[self.column_x])
+                y_value = utilities.string_to_float(values[self.column_y])
+            except IndexError as error:
+                raise ParseError(
+                    _("Import failed, column index out of range"),
+                ) from error
+            if x_value is None or y_value is None:
+                raise ValueError
+        self._xdata.append(numpy.array([x_value], dtype=float))
+        self._ydata.append(numpy.array([y_value], dtype=float))
+
+    def _parse_headers(self, line: str) -> None:
+        headers = self.delimiter.split(line)
+        # If no label could be found at the index, skip.
+        with contextlib.suppress(IndexError):
+            if len(headers) == 1:
+                self.ylabel = headers[self.column_x]
             else:
-                try:
-                    x_value = utilities.string_to_float(values[column_x])
-                    y_value = utilities.string_to_float(values[column_y])
-                    if x_value is None or y_value is None:
-                        raise ValueError
-                    item_.xdata.append(x_value)
-                    item_.ydata.append(y_value)
-                    start_values = True
-                except IndexError as error:
-                    raise ParseError(
-                        _("Import failed, column index out of range"),
-                    ) from error
-        # If not all values in the line are floats, start looking for
-        # headers instead
+                self.xlabel = headers[self.column_x]
+                self.ylabel = headers[self.column_y]
+
+    def _parse_block(self, lines: list[str], index: int) -> None:
+        try:
+            self._parse_block_vectorized(lines, index)
         except ValueError:
-            # Don't try to add headers when started adding values
-            if not start_values:
-                try:
-                    headers = re.split(delimiter, line)
-                    if len(values) == 1:
-                        item_.set_ylabel(headers[column_x])
-                    else:
-                        item_.set_xlabel(headers[column_x])
-                        item_.set_ylabel(headers[column_y])
-                # If no label could be found at the index, skip.
-                except IndexError:
-                    pass
-    stream.close()
-    if not item_.xdata:
+            if len(lines) > _MIN_BLOCK_SIZE:
+                middle = len(lines) // 2
+                self._parse_block(lines[:middle], index)
+                self._parse_block(lines[middle:], index + middle)
+                return
+            for count, line in enumerate(lines, index):
+                # Values that cannot be parsed after the start are skipped
+                with contextlib.suppress(ValueError):
+                    self._append_line(line, count)
+
+    def _parse_block_vectorized(self, lines: list[str], index: int) -> None:
+        """
+        Parse a block of plain numbers at once.
+
+        Raises a ValueError if the block contains anything but plain numbers
+        in a consistent amount of columns.
+        """
+        if self._block_delimiter is None:
+            text = "\n".join(
+                "\t".join(self.delimiter.split(line)) for line in lines
+            )
+        else:
+            text = self._block_delimiter.sub("\t", "\n".join(lines))
+        if self.separator == ",":
+            text = text.replace(",", _PH).replace(".", ", ").replace(_PH, ".")
+        n_columns = len(self._split(lines[0]))
+        if n_columns == 1:
+            # Empty lines still count towards the index of the x-values
+            if "\n\n" in text or text.startswith("\n"):
+                raise ValueError
+            usecols = None
+        elif max(self.column_x, self.column_y) >= n_columns:
+            raise ParseError(_("Import failed, column index out of range"))
+        else:
+            usecols = (self.column_x, self.column_y)
+        values = numpy.loadtxt(
+            io.StringIO(text),
+            delimiter="\t",
+            usecols=usecols,
+            comments=None,
+            ndmin=2,
+        )
+        if n_columns == 1:
+            ydata = values[:, 0]
+            xdata = numpy.arange(index, index + len(ydata), dtype=float)
+        else:
+            xdata, ydata = values[:, 0], values[:, 1]
+        # The expression evaluator does not accept nan, so neither do we
+        mask = ~(numpy.isnan(xdata) | numpy.isnan(ydata))
+        self._xdata.append(xdata[mask])
+        self._ydata.append(ydata[mask])
+
+
+@profiling.timed(size=profiling.count_points)
+def import_from_columns(params, style, file: Gio.File) -> misc.ItemList:
+    """Import data from columns file."""
+    parser = _ColumnsParser(params)
+    with gio_pyio.open(file, "rt") as wrapper:
+        xdata, ydata = parser.parse(wrapper)
+    if len(xdata) == 0:
         raise ParseError(_("Unable to import from file"))
+    item_ = item.DataItem.new(
+        style,
+        xdata,
+        ydata,
+        name=Graphs.tools_get_filename(file),
+    )
+    if parser.xlabel is not None:
+        item_.set_xlabel(parser.xlabel)
+    if parser.ylabel is not None:
+        item_.set_ylabel(parser.ylabel)
     return [item_]
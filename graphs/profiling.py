@@ -0,0 +1,185 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+Opt-in timing of hot paths.
+
+Profiling is enabled by setting the GRAPHS_PROFILE environment variable or
+by running a debug build. Wall time, call counts and processed points of all
+instrumented sections are summarized in the log on exit. If GRAPHS_PROFILE
+is set to a file path, collapsed stacks are written to that file as well,
+which can be rendered with flame graph tools. When disabled, instrumented
+code only checks a single flag.
+
+    Functions:
+        enable
+        is_enabled
+        section
+        timed
+        count_points
+        report
+"""
+import atexit
+import functools
+import logging
+import os
+import threading
+import time
+
+_ENVIRONMENT_VARIABLE = "GRAPHS_PROFILE"
+
+_enabled = False
+_output = None
+_lock = threading.Lock()
+# name: [calls, total time, maximum time, points]
+_records = {}
+# collapsed stack: self time
+_stacks = {}
+_local = threading.local()
+
+
+def enable(output: str = None) -> None:
+    """
+    Enable profiling and report on exit.
+
+    If given, collapsed stacks are written to the output path as well.
+    """
+    global _enabled, _output
+    if not _enabled:
+        atexit.register(report)
+    _enabled = True
+    _output = output or _output
+
+
+def is_enabled() -> bool:
+    """Whether profiling is enabled."""
+    return _enabled
+
+
+class _Section():
+    """Timed section, the amount of processed points may be set within."""
+
+    __slots__ = ("name", "size", "_start", "_children")
+
+    def __init__(self, name: str, size: int = 0):
+        self.name = name
+        self.size = size
+        self._children = 0
+
+    def __enter__(self):
+        try:
+            stack = _local.stack
+        except AttributeError:
+            stack = _local.stack = []
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_args) -> None:
+        elapsed = time.perf_counter() - self._start
+        stack = _local.stack
+        path = ";".join(section_.name for section_ in stack)
+        stack.pop()
+        if stack:
+            stack[-1]._children += elapsed
+        with _lock:
+            record = _records.setdefault(self.name, [0, 0, 0, 0])
+            record[0] += 1
+            record[1] += elapsed
+            record[2] = max(record[2], elapsed)
+            record[3] += self.size
+            _stacks[path] = _stacks.get(path, 0) + elapsed - self._children
+
+
+class _NullSection():
+    """Section used when profiling is disabled, ignores everything."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args) -> None:
+        pass
+
+    def __setattr__(self, _name, _value) -> None:
+        pass
+
+
+_NULL_SECTION = _NullSection()
+
+
+def section(name: str, size: int = 0):
+    """Get a context manager that times the code within."""
+    if not _enabled:
+        return _NULL_SECTION
+    return _Section(name, size)
+
+
+def timed(name: str = None, size=None):
+    """
+    Time all calls of the decorated function.
+
+    Name defaults to the module and qualified name of the function. If
+    given, size is called with the result to get the processed points.
+    """
+
+    def decorator(function):
+        label = name or \
+            f"{function.__module__.rsplit('.', 1)[-1]}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Section(label) as section_:
+                result = function(*args, **kwargs)
+                if size is not None:
+                    section_.size = size(result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def count_points(items: list) -> int:
+    """Count the data points of items."""
+    return sum(
+        len(item_.props.xdata) for item_ in items
+        if hasattr(item_.props, "xdata")
+    )
+
+
+def report() -> None:
+    """Log a summary of all sections and write collapsed stacks."""
+    with _lock:
+        records = sorted(
+            _records.items(), key=lambda record: record[1][1], reverse=True,
+        )
+        stacks = dict(_stacks)
+    if not records:
+        return
+    lines = [
+        f"{'Section':48} {'Calls':>8} {'Total (s)':>10} "
+        f"{'Mean (ms)':>10} {'Max (ms)':>10} {'Points':>12}",
+    ]
+    for name, (calls, total, maximum, points) in records:
+        lines.append(
+            f"{name:48} {calls:8d} {total:10.3f} "
+            f"{1000 * total / calls:10.3f} {1000 * maximum:10.3f} "
+            f"{points:12d}",
+        )
+    logging.info("Profiling summary:\n%s", "\n".join(lines))
+    if _output is None:
+        return
+    try:
+        with open(_output, "w") as file:
+            for path, duration in sorted(stacks.items()):
+                # Flame graph tools expect integer sample counts
+                file.write(f"{path} {round(duration * 1e6)}\n")
+    except OSError as error:
+        logging.warning("Could not write profile: %s", error)
+
+
+_value = os.environ.get(_ENVIRONMENT_VARIABLE)
+if _value:
+    enable(None if _value.lower() in ("1", "true", "yes") else _value)
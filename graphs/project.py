@@ -1,12 +1,36 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
-"""Module for saving and loading projects."""
+"""
+Module for saving and loading projects.
+
+Since project version 3, projects are stored in a binary container. The
+container starts with `_MAGIC`, followed by the length of the JSON metadata as
+unsigned little-endian 64 bit integer and the metadata itself. After padding to
+`_ALIGNMENT` bytes, all arrays in the project are stored as raw little-endian
+float64 columns, each one aligned to `_ALIGNMENT` bytes as well. Inside the
+metadata, arrays are replaced by `{"__column__": index}`, where index refers
+to the offset and length stored under the `columns` key.
+
+On load, the columns are memory-mapped where possible, so that opening large
+projects does not require reading all data up front.
+"""
+import json
+import struct
 from gettext import gettext as _
 
 from gi.repository import Gio
 
-from graphs import file_io, migrate
+import gio_pyio
+
+from graphs import file_io, migrate, profiling
 
-CURRENT_PROJECT_VERSION = 2
+import numpy
+
+CURRENT_PROJECT_VERSION = 3
+
+_MAGIC = b"\x89GRAPHS\n"
+_ALIGNMENT = 64
+_COLUMN_DTYPE = numpy.dtype("<f8")
+_COLUMN_KEY = "__column__"
 
 
 class ProjectParseError(Exception):
@@ -63,14 +87,34 @@ class ProjectMigrator:
             return self._project_dict
 
         # Migrate a project one version at a time
-        for version in range(CURRENT_PROJECT_VERSION - project_version):
-            getattr(self, f"_migrate_v{version + 2}")()
+        for version in range(project_version + 1, CURRENT_PROJECT_VERSION + 1):
+            getattr(self, f"_migrate_v{version}")()
         return self._project_dict
 
     def _migrate_v2(self):
         # Migrate v1 to v2
         self._migrate_inserted_scale(2)  # log2 scale added
 
+    def _migrate_v3(self):
+        # Migrate v2 to v3, data is stored in binary columns from now on
+        def to_arrays(item_dict):
+            for key in ("xdata", "ydata"):
+                if key in item_dict:
+                    item_dict[key] = numpy.asarray(item_dict[key], dtype=float)
+
+        for item_dict in self._project_dict["data"]:
+            to_arrays(item_dict)
+        for history_state in self._project_dict["history-states"]:
+            for change_type, change in history_state[0]:
+                if change_type == 0 and change[1] in ("xdata", "ydata"):
+                    for index in (2, 3):
+                        change[index] = \
+                            numpy.asarray(change[index], dtype=float)
+                elif change_type == 1:
+                    to_arrays(change)
+                elif change_type == 2:
+                    to_arrays(change[1])
+
     def _migrate_inserted_scale(self, scale_index):
         """Handle a new scale being inserted at scale_index."""
         figure_settings = self._project_dict["figure-settings"]
@@ -94,16 +138,123 @@ class ProjectMigrator:
                             change_index][1][i] = val + 1
 
 
+def _align(position: int) -> int:
+    return -(-position // _ALIGNMENT) * _ALIGNMENT
+
+
+def _extract_columns(value, columns: list, indices: dict):
+    """Replace all arrays in value with references to columns."""
+    if isinstance(value, numpy.ndarray):
+        # Arrays referenced multiple times are only stored once
+        if id(value) not in indices:
+            indices[id(value)] = len(columns)
+            columns.append(value)
+        return {_COLUMN_KEY: indices[id(value)]}
+    if isinstance(value, dict):
+        return {
+            key: _extract_columns(item, columns, indices)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_extract_columns(item, columns, indices) for item in value]
+    return value
+
+
+def _insert_columns(value, columns: list):
+    """Replace all column references in value with the actual arrays."""
+    if isinstance(value, dict):
+        if len(value) == 1 and _COLUMN_KEY in value:
+            return columns[value[_COLUMN_KEY]]
+        return {
+            key: _insert_columns(item, columns)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_insert_columns(item, columns) for item in value]
+    return value
+
+
+def _is_container(file: Gio.File) -> bool:
+    with gio_pyio.open(file, "rb") as wrapper:
+        return wrapper.read(len(_MAGIC)) == _MAGIC
+
+
+def _read_container(file: Gio.File) -> dict:
+    """Read a binary project container, memory-mapping the columns."""
+    header_size = len(_MAGIC) + 8
+    with gio_pyio.open(file, "rb") as wrapper:
+        header = wrapper.read(header_size)
+        if len(header) != header_size:
+            raise ProjectParseError(_("Project file is missing data"))
+        metadata_size = struct.unpack("<Q", header[len(_MAGIC):])[0]
+        try:
+            metadata = json.loads(wrapper.read(metadata_size).decode("utf-8"))
+        except ValueError as e:
+            raise ProjectParseError(_("Project file is missing data")) from e
+        data_start = _align(header_size + metadata_size)
+        path = file.get_path()
+        if path is None:
+            # Not a local file, so it cannot be mapped
+            wrapper.seek(data_start)
+            buffer = numpy.frombuffer(wrapper.read(), dtype=_COLUMN_DTYPE)
+    column_info = metadata.pop("columns")
+    if path is not None and column_info:
+        try:
+            buffer = numpy.asarray(numpy.memmap(
+                path,
+                dtype=_COLUMN_DTYPE,
+                mode="c",
+                offset=data_start,
+            ))
+        except ValueError as e:
+            raise ProjectParseError(_("Project file is missing data")) from e
+    columns = []
+    for offset, length in column_info:
+        start = offset // _COLUMN_DTYPE.itemsize
+        if start + length > len(buffer):
+            raise ProjectParseError(_("Project file is missing data"))
+        columns.append(buffer[start:start + length])
+    return _insert_columns(metadata, columns)
+
+
+def _write_container(file: Gio.File, project_dict: dict) -> None:
+    """Write a project dict to a binary project container."""
+    columns = []
+    metadata = _extract_columns(project_dict, columns, {})
+    column_info = []
+    offset = 0
+    for index, column in enumerate(columns):
+        columns[index] = numpy.ascontiguousarray(column, dtype=_COLUMN_DTYPE)
+        column_info.append((offset, len(column)))
+        offset = _align(offset + columns[index].nbytes)
+    metadata["columns"] = column_info
+    metadata = json.dumps(metadata, sort_keys=True).encode("utf-8")
+    header_size = len(_MAGIC) + 8 + len(metadata)
+    with gio_pyio.open(file, "wb") as wrapper:
+        wrapper.write(_MAGIC)
+        wrapper.write(struct.pack("<Q", len(metadata)))
+        wrapper.write(metadata)
+        wrapper.write(bytes(_align(header_size) - header_size))
+        for column in columns:
+            wrapper.write(column.tobytes())
+            wrapper.write(bytes(_align(column.nbytes) - column.nbytes))
+
+
+@profiling.timed()
 def read_project_file(file: Gio.File) -> dict:
     """Read a project dict from file and account for migration."""
-    try:
-        project_dict = file_io.parse_json(file)
-    except UnicodeDecodeError:
-        project_dict = migrate.migrate_project(file)
+    if _is_container(file):
+        project_dict = _read_container(file)
+    else:
+        try:
+            project_dict = file_io.parse_json(file)
+        except UnicodeDecodeError:
+            project_dict = migrate.migrate_project(file)
     return ProjectMigrator(project_dict).migrate()
 
 
+@profiling.timed()
 def save_project_dict(file: Gio.File, project_dict: dict) -> None:
     """Save a project dict to a file."""
     project_dict["project-version"] = CURRENT_PROJECT_VERSION
-    file_io.write_json(file, project_dict, pretty_print=False)
+    _write_container(file, project_dict)
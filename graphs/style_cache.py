@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+On-disk cache of parsed styles and their previews.
+
+Every style file has a single entry in the user cache directory, which is
+only used if the path, modification time and content of the file are
+unchanged. Unchanged styles are loaded without parsing them or rendering
+their preview with matplotlib.
+
+    Functions:
+        parse
+        get_preview
+"""
+import hashlib
+import io
+import logging
+import os
+import pickle
+
+from gi.repository import GLib, Gdk, Gio
+
+from graphs import style_io
+
+import matplotlib
+from matplotlib import RcParams
+
+# Bump when the format of cache entries changes
+_VERSION = 2
+# Entries loaded during this session, by uri
+_entries = {}
+
+
+def _get_directory() -> Gio.File:
+    """Get the cache directory for styles."""
+    return Gio.File.new_for_path(
+        os.path.join(GLib.get_user_cache_dir(), "graphs", "styles"),
+    )
+
+
+def _get_key(file: Gio.File) -> tuple:
+    """Get the key of a style file from its path, mtime and content."""
+    try:
+        info = file.query_info(
+            "time::modified", Gio.FileQueryInfoFlags.NONE, None,
+        )
+        mtime = info.get_modification_date_time()
+        mtime = mtime.format_iso8601() if mtime is not None else None
+    except GLib.Error:
+        mtime = None
+    content = hashlib.sha256(file.load_contents(None)[1]).hexdigest()
+    return (_VERSION, matplotlib.__version__, file.get_uri(), mtime, content)
+
+
+def _get_cache_file(file: Gio.File) -> Gio.File:
+    """Get the cache file of a style file."""
+    name = hashlib.sha256(file.get_uri().encode()).hexdigest()
+    return _get_directory().get_child_for_display_name(name + ".pickle")
+
+
+def _load_entry(file: Gio.File) -> dict:
+    """Load the cache entry of a style file, parsing it if outdated."""
+    key = _get_key(file)
+    uri = file.get_uri()
+    if uri in _entries and _entries[uri]["key"] == key:
+        return _entries[uri]
+    cache_file = _get_cache_file(file)
+    try:
+        contents = cache_file.load_contents(None)[1]
+    except GLib.Error:
+        contents = None
+    if contents is not None:
+        # The key only holds builtin types, check it before unpickling the
+        # entry, which may have been written by other library versions. Any
+        # failure means the entry is stale or corrupt.
+        try:
+            cached_key, cached_entry = pickle.loads(contents)
+            if cached_key == key:
+                entry = pickle.loads(cached_entry)
+                _entries[uri] = entry
+                return entry
+        except Exception as error:  # noqa: PIE786
+            logging.debug("Discarding style cache entry: %s", error)
+            _delete_entry(cache_file)
+    style, graphs_params = style_io.parse(file)
+    entry = {
+        "key": key,
+        "style": dict(dict.items(style)),
+        "graphs_params": graphs_params,
+        "previews": {},
+    }
+    _entries[uri] = entry
+    _save_entry(cache_file, entry)
+    return entry
+
+
+def _save_entry(cache_file: Gio.File, entry: dict) -> None:
+    """Save a cache entry, failing silently as the cache is optional."""
+    try:
+        directory = cache_file.get_parent()
+        if not directory.query_exists(None):
+            directory.make_directory_with_parents(None)
+        cache_file.replace_contents(
+            pickle.dumps((entry["key"], pickle.dumps(entry))),
+            None,
+            False,
+            Gio.FileCreateFlags.NONE,
+            None,
+        )
+    except GLib.Error as error:
+        logging.debug("Could not save style cache: %s", error.message)
+
+
+def _delete_entry(cache_file: Gio.File) -> None:
+    """Delete a cache entry, if it still exists."""
+    try:
+        cache_file.delete(None)
+    except GLib.Error as error:
+        logging.debug("Could not delete style cache: %s", error.message)
+
+
+def parse(file: Gio.File, validate: RcParams = None) -> (RcParams, dict):
+    """Parse a style like `style_io.parse`, using the cache if possible."""
+    entry = _load_entry(file)
+    style = RcParams()
+    if validate is not None:
+        style._update_raw(validate)
+    # Cached values have been validated when the file was parsed
+    style._update_raw(entry["style"])
+    return style, dict(entry["graphs_params"])
+
+
+def get_preview(file: Gio.File, style: RcParams) -> Gdk.Texture:
+    """Get the preview of a parsed style, using the cache if possible."""
+    entry = _load_entry(file)
+    params_hash = hashlib.sha256(
+        repr(sorted(dict.items(style))).encode(),
+    ).hexdigest()
+    if params_hash in entry["previews"]:
+        return Gdk.Texture.new_from_bytes(
+            GLib.Bytes.new(entry["previews"][params_hash]),
+        )
+    buffer = io.BytesIO()
+    style_io.create_preview(buffer, style)
+    texture = Gdk.Texture.new_from_bytes(GLib.Bytes.new(buffer.getvalue()))
+    entry["previews"][params_hash] = texture.save_to_png_bytes().get_data()
+    _save_entry(_get_cache_file(file), entry)
+    return texture
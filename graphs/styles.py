@@ -1,11 +1,10 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """Module for style utilities."""
-import io
 import os
 
-from gi.repository import Adw, GLib, Gdk, Gio, Graphs, Gtk
+from gi.repository import Adw, Gio, Graphs, Gtk
 
-from graphs import style_io
+from graphs import style_cache, style_io
 
 from matplotlib import RcParams
 
@@ -19,12 +18,6 @@ def _is_style_bright(params: RcParams):
     return Graphs.tools_get_luminance_from_hex(params["axes.facecolor"]) < 0.4
 
 
-def _generate_preview(style: RcParams) -> Gdk.Texture:
-    buffer = io.BytesIO()
-    style_io.create_preview(buffer, style)
-    return Gdk.Texture.new_from_bytes(GLib.Bytes.new(buffer.getvalue()))
-
-
 class StyleManager(Graphs.StyleManager):
     """
     Main Style Manager.
@@ -52,12 +45,12 @@ class StyleManager(Graphs.StyleManager):
     @staticmethod
     def _on_style_request(self, file: Gio.File) -> Graphs.Style:
         try:
-            style_params, graphs_params = style_io.parse(
+            style_params, graphs_params = style_cache.parse(
                 file,
                 self._system_style_params,
             )
             name = graphs_params["name"]
-            preview = _generate_preview(style_params)
+            preview = style_cache.get_preview(file, style_params)
             light = _is_style_bright(style_params)
         except style_io.StyleParseError:
             name = ""
@@ -80,7 +73,7 @@ class StyleManager(Graphs.StyleManager):
         if Adw.StyleManager.get_default().get_dark():
             system_style += " Dark"
         filename = _generate_filename(system_style)
-        self._system_style_params = style_io.parse(
+        self._system_style_params = style_cache.parse(
             Gio.File.new_for_uri(
                 "resource:///se/sjoerd/Graphs/styles/" + filename,
             ),
@@ -1,12 +1,12 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """Various utility functions."""
 import ast
-import contextlib
+import functools
 import math
 import operator as op
 import re
 
-from graphs import scales
+from graphs import profiling, scales
 from graphs.misc import FUNCTIONS
 
 import numexpr
@@ -15,6 +15,14 @@ import numpy
 
 import sympy
 
+# Number of compiled equations to keep in memory
+_EQUATION_CACHE_SIZE = 256
+# Spacing of the initial samples and minimal spacing of samples in pixels
+_INITIAL_SAMPLE_SPACING = 4
+_MIN_SAMPLE_SPACING = 1 / 16
+# Maximum distance in pixels between the sampled line and the equation
+_SAMPLE_TOLERANCE = 0.25
+
 
 def sig_fig_round(number: float, digits: int) -> float:
     """Round a number to the specified number of significant digits."""
@@ -116,6 +124,30 @@ def get_fraction_at_value(
         return (scaled_data_point - 1 / end) / scaled_range
 
 
+def get_extents(array: numpy.ndarray) -> tuple:
+    """
+    Get the minimum, maximum and minimum positive of the finite values.
+
+    Values are None if there are no such values.
+    """
+    if len(array) == 0:
+        return None, None, None
+    min_value, max_value = array.min(), array.max()
+    if not (numpy.isfinite(min_value) and numpy.isfinite(max_value)):
+        array = array[numpy.isfinite(array)]
+        if len(array) == 0:
+            return None, None, None
+        min_value, max_value = array.min(), array.max()
+    if min_value > 0:
+        min_positive = min_value
+    elif max_value > 0:
+        min_positive = array[array > 0].min()
+    else:
+        min_positive = None
+    return float(min_value), float(max_value), \
+        None if min_positive is None else float(min_positive)
+
+
 def string_to_float(string: str) -> float:
     """Evaluate a string represantation of a number."""
     try:
@@ -287,43 +319,179 @@ def prettify_equation(equation: str) -> str:
     return equation.replace(")*(", ")(")
 
 
+@functools.lru_cache(maxsize=_EQUATION_CACHE_SIZE)
+@profiling.timed()
+def compile_equation(equation: str) -> tuple:
+    """
+    Preprocess and compile an equation.
+
+    Returns the preprocessed equation, the compiled numexpr expression in x
+    and the free variables. The expression is None if the equation cannot be
+    evaluated. Results are cached, so that equations are only parsed once.
+    """
+    processed_equation = preprocess(equation)
+    try:
+        # Add x*0, such that output is an array even for constants
+        expression = numexpr.NumExpr(
+            processed_equation + " + x*0",
+            signature=[("x", numpy.float64)],
+        )
+    except (KeyError, SyntaxError, ValueError, TypeError):
+        expression = None
+    free_variables = tuple(get_free_variables(processed_equation))
+    return processed_equation, expression, free_variables
+
+
+def _sample_adaptive(
+    expression: numexpr.NumExpr,
+    limits: tuple,
+    scale: int,
+    y_limits: tuple,
+    y_scale: int,
+    size: tuple,
+) -> tuple:
+    """
+    Sample an expression adaptively.
+
+    Start with evenly spaced samples on the given scale, and keep halving
+    intervals where the midpoint deviates more than `_SAMPLE_TOLERANCE` pixels
+    from the line between its neighbours, or where the expression becomes
+    non-finite. If y_limits is None, the bulk of the initial samples is used.
+    """
+    width, height = size
+    x_start, x_stop = limits
+
+    def evaluate(fractions):
+        xdata = numpy.asarray(
+            get_value_at_fraction(fractions, x_start, x_stop, scale),
+            dtype=float,
+        )
+        return xdata, expression(xdata)
+
+    def to_pixels(ydata):
+        with numpy.errstate(all="ignore"):
+            return get_fraction_at_value(ydata, *y_limits, y_scale) * height
+
+    samples = max(int(width / _INITIAL_SAMPLE_SPACING), 2)
+    fractions = numpy.linspace(0, 1, samples + 1)
+    xdata, ydata = evaluate(fractions)
+    if y_limits is None:
+        finite = ydata[numpy.isfinite(ydata)]
+        y_limits = numpy.percentile(finite, (1, 99)) \
+            if len(finite) > 0 else (0, 1)
+        if y_limits[0] == y_limits[1]:
+            y_limits = (y_limits[0] - 1, y_limits[1] + 1)
+    ypixels = to_pixels(ydata)
+
+    all_fractions, all_xdata, all_ydata = [fractions], [xdata], [ydata]
+    lefts = fractions[:-1]
+    left_pixels, right_pixels = ypixels[:-1], ypixels[1:]
+    spacing = 1 / samples
+    while len(lefts) > 0 and spacing * width > _MIN_SAMPLE_SPACING:
+        spacing /= 2
+        middles = lefts + spacing
+        xdata, ydata = evaluate(middles)
+        middle_pixels = to_pixels(ydata)
+        dx = 2 * spacing * width
+        dy = right_pixels - left_pixels
+        with numpy.errstate(all="ignore"):
+            # Distance from the midpoint to the line between its neighbours
+            error = numpy.abs(middle_pixels - left_pixels - dy / 2) * dx \
+                / numpy.hypot(dx, dy)
+        left_finite = numpy.isfinite(left_pixels)
+        middle_finite = numpy.isfinite(middle_pixels)
+        right_finite = numpy.isfinite(right_pixels)
+        refine = (error > _SAMPLE_TOLERANCE) \
+            | (left_finite != middle_finite) | (middle_finite != right_finite)
+        all_fractions.append(middles[refine])
+        all_xdata.append(xdata[refine])
+        all_ydata.append(ydata[refine])
+        lefts = numpy.concatenate((lefts[refine], middles[refine]))
+        left_pixels, right_pixels = (
+            numpy.concatenate((left_pixels[refine], middle_pixels[refine])),
+            numpy.concatenate((middle_pixels[refine], right_pixels[refine])),
+        )
+    order = numpy.argsort(numpy.concatenate(all_fractions))
+    return (
+        numpy.concatenate(all_xdata)[order],
+        numpy.concatenate(all_ydata)[order],
+    )
+
+
+@profiling.timed(
+    size=lambda result: 0 if result[0] is None else len(result[0]),
+)
 def equation_to_data(
     equation: str,
     limits: tuple = None,
     steps: int = 5000,
+    scale: int = 0,
+    y_limits: tuple = None,
+    y_scale: int = 0,
+    size: tuple = (1000, 1000),
 ) -> tuple:
-    """Convert an equation into data over a specified range of x-values."""
+    """
+    Convert an equation into data over a specified range of x-values.
+
+    The data is evenly spaced in steps. If steps is None, the equation is
+    sampled adaptively for a plot of size pixels with the given scales, and
+    y_limits if known.
+    """
     if limits is None:
         limits = (0, 10)
-    equation = preprocess(equation)
-    x_start, x_stop = limits
-    xdata = numpy.ndarray.tolist(numpy.linspace(x_start, x_stop, steps))
-    try:
-        ydata = numpy.ndarray.tolist(
-            numexpr.evaluate(equation + " + x*0", local_dict={"x": xdata}),
-        )
-    except (KeyError, SyntaxError, ValueError, TypeError):
+    expression = compile_equation(equation)[1]
+    if expression is None:
         return None, None
-    return xdata, ydata
+    if steps is None:
+        return _sample_adaptive(
+            expression, limits, scale, y_limits, y_scale, size,
+        )
+    x_start, x_stop = limits
+    xdata = numpy.linspace(x_start, x_stop, steps)
+    return xdata, expression(xdata)
 
 
-def validate_equation(equation: str, limits: tuple = None) -> bool:
+def validate_equation(equation: str) -> bool:
     """Validate whether an equation can be parsed."""
-    equation = preprocess(equation)
-    validate, _ = equation_to_data(equation, limits, steps=10)
-    return (validate is not None)
+    return compile_equation(equation)[1] is not None
+
 
+@functools.lru_cache(maxsize=_EQUATION_CACHE_SIZE)
+def string_to_model(equation_name: str) -> tuple:
+    """
+    Convert a string into a vectorized function and its Jacobian.
 
-def string_to_function(equation_name: str) -> sympy.FunctionClass:
-    """Convert a string into a sympy function."""
+    Both take x followed by the free variables as arguments. The Jacobian is
+    derived symbolically and has a column for each free variable. Returns
+    (None, None) if the equation cannot be parsed.
+    """
     variables = ["x"] + get_free_variables(equation_name)
     sym_vars = sympy.symbols(variables)
-    with contextlib.suppress(sympy.SympifyError, TypeError, SyntaxError):
+    try:
         symbolic = sympy.sympify(
             equation_name,
             locals=dict(zip(variables, sym_vars)),
         )
-        return sympy.lambdify(sym_vars, symbolic)
+        function = sympy.lambdify(sym_vars, symbolic, "numpy")
+        derivatives = sympy.lambdify(
+            sym_vars,
+            [sympy.diff(symbolic, var) for var in sym_vars[1:]],
+            "numpy",
+        )
+    except (sympy.SympifyError, TypeError, SyntaxError):
+        return None, None
+
+    # Constant terms evaluate to scalars, so broadcast them to x
+    def vectorized_function(x, *params):
+        return numpy.broadcast_to(function(x, *params), numpy.shape(x))
+
+    def jacobian(x, *params):
+        return numpy.column_stack([
+            numpy.broadcast_to(column, numpy.shape(x))
+            for column in derivatives(x, *params)
+        ])
+
+    return vectorized_function, jacobian
 
 
 def get_free_variables(equation_name: str) -> list:
@@ -338,4 +506,4 @@ def get_free_variables(equation_name: str) -> list:
         r"|exp\b|sqrt\b|abs\b|log10\b)"  # Exclude 'exp', 'sqrt', 'abs'
         r"[a-zA-Z]+\b"  # Match any character sequence that is not excluded
     )
-    return list(set(re.findall(pattern, equation_name)))
+    return list(dict.fromkeys(re.findall(pattern, equation_name)))
@@ -0,0 +1,21 @@
+"""Tests for artist."""
+from graphs import artist
+
+from matplotlib.figure import Figure
+
+import numpy
+
+
+def test_get_fill_polygons():
+    """Test if fill polygons match those of fill_between."""
+    xdata = numpy.linspace(0, 10, 50)
+    ydata1, ydata2 = numpy.sin(xdata), numpy.cos(xdata) + 2
+    ydata1[20] = numpy.nan
+    polygons = artist._get_fill_polygons(xdata, ydata1, ydata2)
+    paths = Figure().add_subplot().fill_between(
+        xdata, ydata1, ydata2,
+    ).get_paths()
+    assert len(polygons) == len(paths) == 2
+    for polygon, path in zip(polygons, paths):
+        # Paths of fill_between repeat the first vertex to close the polygon
+        numpy.testing.assert_array_equal(polygon, path.vertices[:-1])
@@ -0,0 +1,81 @@
+"""Tests for batch processing."""
+from gi.repository import Gio
+
+from graphs import batch, item, project
+
+from matplotlib.colors import is_color_like
+
+import numpy
+
+import pytest
+
+_COLOR_CYCLE = ["#1A5FB4", "#26A269", "#E5A50A"]
+
+
+def test_parse_operation():
+    """Test if parse_operation splits names and arguments."""
+    assert batch.parse_operation("normalize") == ("normalize",)
+    assert batch.parse_operation("transform:x:y*2") == \
+        ("transform", "x", "y*2")
+    with pytest.raises(batch.BatchError):
+        batch.parse_operation("explode")
+
+
+def test_get_project_dict():
+    """Test if get_project_dict sets limits around all data."""
+    item_dicts = [
+        {"xdata": numpy.array([0.0, 10.0]), "ydata": numpy.array([1.0, 3.0])},
+        {"xdata": numpy.array([-10.0, 0.0]), "ydata": numpy.array([2.0, 5.0])},
+    ]
+    project_dict = batch.get_project_dict(
+        item_dicts, {"title": "Batch", "max_right": 10}, _COLOR_CYCLE,
+    )
+    figure_settings = project_dict["figure-settings"]
+    assert figure_settings["min_bottom"] == pytest.approx(-10.3)
+    assert figure_settings["max_bottom"] == pytest.approx(10.3)
+    assert figure_settings["min_left"] == pytest.approx(0.8)
+    assert figure_settings["max_left"] == pytest.approx(5.2)
+    # Unused axes keep their defaults
+    assert figure_settings["max_right"] == 10
+    assert figure_settings["title"] == "Batch"
+    assert project_dict["data"] is item_dicts
+
+
+def test_project_colors(tmp_path):
+    """Test if every item of a batch project has a valid color."""
+    item_dicts = [
+        {
+            "type": "GraphsDataItem",
+            "name": f"data {index}",
+            "color": "",
+            "xdata": numpy.array([0.0, 1.0]),
+            "ydata": numpy.array([0.0, float(index)]),
+        }
+        for index in range(len(_COLOR_CYCLE) + 1)
+    ]
+    file = Gio.File.new_for_path(str(tmp_path / "batch.graphs"))
+    project.save_project_dict(
+        file, batch.get_project_dict(item_dicts, {}, _COLOR_CYCLE),
+    )
+    colors = [
+        item.new_from_dict(item_dict).get_color()
+        for item_dict in project.read_project_file(file)["data"]
+    ]
+    assert all(is_color_like(color) for color in colors)
+    # The cycle starts over once all colors are used
+    assert colors == _COLOR_CYCLE + _COLOR_CYCLE[:1]
+
+
+def test_process_path_error(monkeypatch):
+    """Test if unexpected errors are reported for a single file."""
+    monkeypatch.setattr(batch, "get_settings", lambda *_args: None)
+
+    def process_file(*_args):
+        raise KeyError("column")
+
+    monkeypatch.setattr(batch, "process_file", process_file)
+    path, item_dicts, message = batch._process_path(
+        "data.txt", [], "output", "columns", "", {},
+    )
+    assert (path, item_dicts) == ("data.txt", None)
+    assert message == "KeyError: 'column'"
@@ -0,0 +1,55 @@
+"""Tests for exporting items."""
+from gi.repository import Gio
+
+from graphs import export_items
+from graphs.item import DataItem
+
+import numpy
+
+import pytest
+
+
+@pytest.mark.parametrize("name", ["data.txt", "data.txt.gz", "data.txt.xz"])
+def test_export_columns(tmp_path, name):
+    """Test if columns are written, compressed according to the suffix."""
+    item_ = DataItem(xdata=[1, 2, 3], ydata=[0.1, 0.2, 1e10])
+    item_.set_xlabel("x")
+    item_.set_ylabel("y")
+    path = tmp_path / name
+    export_items.export_items(
+        "columns", Gio.File.new_for_path(str(path)), [item_], None,
+    )
+    array = numpy.loadtxt(path, skiprows=1)
+    numpy.testing.assert_array_equal(array, [[1, 0.1], [2, 0.2], [3, 1e10]])
+
+
+def test_export_multicolumn(tmp_path):
+    """Test if items of different length share a single file."""
+    items = [
+        DataItem(name="a", xdata=[1, 2], ydata=[3, 4]),
+        DataItem(name="b", xdata=[5], ydata=[6]),
+    ]
+    path = tmp_path / "data.txt"
+    export_items.export_items(
+        "multicolumn", Gio.File.new_for_path(str(path)), items, None,
+    )
+    assert path.read_text().splitlines()[0] == "x\ta\tx\tb"
+    array = numpy.loadtxt(path, skiprows=1)
+    numpy.testing.assert_array_equal(
+        array, [[1, 3, 5, 6], [2, 4, numpy.nan, numpy.nan]],
+    )
+
+
+def test_export_npz(tmp_path):
+    """Test if items with equal names are stored separately."""
+    items = [
+        DataItem(name="a", xdata=[1, 2], ydata=[3, 4]),
+        DataItem(name="a", xdata=[5], ydata=[6]),
+    ]
+    path = tmp_path / "data.npz"
+    export_items.export_items(
+        "npz", Gio.File.new_for_path(str(path)), items, None,
+    )
+    with numpy.load(path) as archive:
+        numpy.testing.assert_array_equal(archive["a"], [[1, 3], [2, 4]])
+        numpy.testing.assert_array_equal(archive["a (2)"], [[5, 6]])
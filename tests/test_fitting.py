@@ -0,0 +1,53 @@
+"""Tests for fitting."""
+from graphs import fitting
+
+import numpy
+
+import pytest
+
+XDATA = numpy.linspace(0, 10, 50)
+
+
+def test_fit_data():
+    """Test if fit_data finds the parameters of a linear model."""
+    ydata = 3 * XDATA + 2
+    param, _cov, r2 = fitting.fit_data("a*x+b", XDATA, ydata)
+    assert param == pytest.approx([3, 2], rel=1e-6)
+    assert r2 == pytest.approx(1)
+
+
+@pytest.mark.parametrize("method", ["lm", "trf"])
+def test_fit_data_infinite_jacobian(method):
+    """Test if fits use finite differences if the Jacobian is infinite."""
+    xdata = numpy.linspace(0, 5, 51)
+    param, _cov, _r2 = \
+        fitting.fit_data("a*x**b", xdata, 2 * xdata**1.5, method=method)
+    assert param == pytest.approx([2, 1.5], rel=1e-6)
+
+
+def test_fit_data_invalid():
+    """Test if fit_data returns None for an invalid equation."""
+    assert fitting.fit_data("a*x+", XDATA, XDATA) is None
+
+
+def test_fit_datasets():
+    """Test if fit_datasets returns a row per dataset."""
+    datasets = [
+        (f"Item {slope}", XDATA, slope * XDATA + 1) for slope in range(1, 4)
+    ]
+    rows = fitting.fit_datasets("a*x+b", datasets, reuse_parameters=True)
+    assert [row["name"] for row in rows] == ["Item 1", "Item 2", "Item 3"]
+    assert [row["parameters"]["a"] for row in rows] == \
+        pytest.approx([1, 2, 3], rel=1e-6)
+    assert "Item 3" in fitting.format_table(rows)
+
+
+def test_fit_datasets_parallel():
+    """Test if datasets fitted in a process pool keep their order."""
+    datasets = [
+        (f"Item {slope}", XDATA, slope * XDATA + 1) for slope in range(1, 4)
+    ]
+    rows = fitting.fit_datasets("a*x+b", datasets, max_workers=2)
+    assert [row["name"] for row in rows] == ["Item 1", "Item 2", "Item 3"]
+    assert [row["parameters"]["a"] for row in rows] == \
+        pytest.approx([1, 2, 3], rel=1e-6)
@@ -1,11 +1,15 @@
 """Tests for operations."""
+from types import SimpleNamespace
+
 from graphs.operations import DataHelper
 from graphs.operations import DataOperations
 
+import numpy
+
 import pytest
 
-XDATA = [0, 1, 4, 5, 7, 8, 12, 1]
-YDATA = [5, 2, 7, 1, 31, 5, 123, 156]
+XDATA = numpy.array([0, 1, 4, 5, 7, 8, 12, 1], dtype=float)
+YDATA = numpy.array([5, 2, 7, 1, 31, 5, 123, 156], dtype=float)
 
 
 def is_sorted(lst):
@@ -19,6 +23,35 @@ def test_sort_data():
     assert is_sorted(sorted_x)
 
 
+def test_get_xydata():
+    """Test if get_xydata returns the data and indices within the span."""
+    item = SimpleNamespace(
+        props=SimpleNamespace(xdata=XDATA, ydata=YDATA),
+        is_sorted=lambda: False,
+    )
+    xdata, ydata, indices = DataHelper.get_xydata(2, (1, 5), item)
+    assert list(indices) == [1, 2, 3, 7]
+    assert list(xdata) == [1, 4, 5, 1]
+    assert list(ydata) == [2, 7, 1, 156]
+
+    xdata, ydata, indices = DataHelper.get_xydata(0, (1, 5), item)
+    assert len(xdata[indices]) == len(XDATA)
+    assert DataHelper.get_xydata(2, (20, 30), item) == (None, None, None)
+
+
+def test_get_xydata_sorted():
+    """Test if get_xydata returns a slice of sorted data within the span."""
+    sorted_x, sorted_y = DataHelper.sort_data(XDATA, YDATA)
+    item = SimpleNamespace(
+        props=SimpleNamespace(xdata=sorted_x, ydata=sorted_y),
+        is_sorted=lambda: True,
+    )
+    xdata, ydata, indices = DataHelper.get_xydata(2, (1, 5), item)
+    assert indices == slice(1, 5)
+    assert list(xdata) == [1, 1, 4, 5]
+    assert numpy.shares_memory(xdata, sorted_x)
+
+
 def test_normalize():
     """Test if normalize function scales ydata to maximum value of 1."""
     xdata, ydata, _sort, _discard = \
@@ -58,7 +91,7 @@ def test_center():
     """Test if center function centers ydata correctly."""
     xdata, ydata, _sort, _discard = \
         DataOperations.center(None, XDATA, YDATA, 0)
-    y_max_index = YDATA.index(max(YDATA))
+    y_max_index = numpy.argmax(YDATA)
     assert xdata[y_max_index] == 0
 
     xdata, ydata, _sort, _discard = \
@@ -70,8 +103,8 @@ def test_center():
 
 def test_derivative():
     """Test if get_derivative function correctly calculates derivative."""
-    xdata = [1, 2, 3, 4, 5]
-    ydata = [5, 10, 15, 10, 5]
+    xdata = numpy.array([1, 2, 3, 4, 5], dtype=float)
+    ydata = numpy.array([5, 10, 15, 10, 5], dtype=float)
 
     _, y_new, _sort, _discard = DataOperations.derivative(None, xdata, ydata)
     assert len(y_new) == len(xdata)
@@ -80,8 +113,8 @@ def test_derivative():
 
 def test_integral():
     """Test if get_integral function correctly calculates integral."""
-    xdata = [1, 2, 3, 4, 5]
-    ydata = [5, 10, 15, 10, 5]
+    xdata = numpy.array([1, 2, 3, 4, 5], dtype=float)
+    ydata = numpy.array([5, 10, 15, 10, 5], dtype=float)
 
     x_new, y_new, _sort, _discard = DataOperations.integral(None, xdata, ydata)
 
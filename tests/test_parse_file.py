@@ -0,0 +1,129 @@
+"""Tests for file parsing."""
+import io
+
+from graphs import parse_file
+from graphs.misc import ParseError
+
+import pytest
+
+
+class _Params(dict):
+    """Stand-in for the columns import settings."""
+
+    def get_int(self, key):
+        """Get integer setting."""
+        return self[key]
+
+    def get_string(self, key):
+        """Get string setting."""
+        return self[key]
+
+
+def _parse(text, **kwargs):
+    params = _Params({
+        "column-x": 0,
+        "column-y": 1,
+        "separator": ". ",
+        "skip-rows": 0,
+        "delimiter": "whitespace",
+        "custom-delimiter": "",
+    })
+    params.update(kwargs)
+    parser = parse_file._ColumnsParser(params)
+    xdata, ydata = parser.parse(io.StringIO(text))
+    return parser, list(xdata), list(ydata)
+
+
+def test_columns_headers():
+    """Test if headers are detected before the first values."""
+    parser, xdata, ydata = _parse("time value\n1 2\n3 4\n")
+    assert (parser.xlabel, parser.ylabel) == ("time", "value")
+    assert xdata == [1, 3]
+    assert ydata == [2, 4]
+
+
+def test_columns_single_column():
+    """Test if a single column uses the line index as x-values."""
+    _parser, xdata, ydata = _parse("1\n\n3\n")
+    assert xdata == [0, 2]
+    assert ydata == [1, 3]
+
+
+def test_columns_expression_fallback():
+    """Test if cells that are not plain numbers are still evaluated."""
+    _parser, xdata, ydata = _parse("1 2\nfoo\n3 2*pi\n")
+    assert xdata == [1, 3]
+    assert ydata == pytest.approx([2, 6.283185307])
+
+
+def test_columns_decimal_comma():
+    """Test if a comma can be used as decimal separator."""
+    _parser, xdata, ydata = _parse(
+        "1;2,5\n3;4,5\n", delimiter="semicolon", separator=", ",
+    )
+    assert ydata == [2.5, 4.5]
+
+
+def test_columns_large_block():
+    """Test if large blocks containing a few expressions are parsed."""
+    lines = [f"{i}\t{2 * i}" for i in range(100000)]
+    lines[5000] = "5000\t5^2"
+    _parser, xdata, ydata = _parse("\n".join(lines), delimiter="tabs")
+    assert len(xdata) == 100000
+    assert ydata[5000] == 25
+    assert ydata[-1] == 199998
+
+
+_XRDML = """<?xml version="1.0" encoding="UTF-8"?>
+<xrdMeasurements xmlns="http://www.xrdml.com/XRDMeasurement/2.0">
+  <xrdMeasurement>
+    <scan scanAxis="2Theta-Omega">
+      <dataPoints>
+        <positions axis="2Theta" unit="deg">
+          <startPosition>10</startPosition>
+          <endPosition>20</endPosition>
+        </positions>
+        <positions axis="Omega" unit="deg">
+          <startPosition>5</startPosition>
+          <endPosition>10</endPosition>
+        </positions>
+        <commonCountingTime unit="seconds">2</commonCountingTime>
+        <intensities unit="counts">2 4
+          6</intensities>
+      </dataPoints>
+    </scan>
+    <scan scanAxis="Gonio">
+      <dataPoints>
+        <positions axis="Omega" unit="deg">
+          <commonPosition>5</commonPosition>
+        </positions>
+        <positions axis="Phi" unit="deg">
+          <listPositions>1 2</listPositions>
+        </positions>
+        <counts unit="counts">3 5</counts>
+      </dataPoints>
+    </scan>
+  </xrdMeasurement>
+</xrdMeasurements>
+"""
+
+
+def test_xrdml_scans():
+    """Test if every scan of an xrdml file is parsed."""
+    scans = list(parse_file._iter_xrdml(io.BytesIO(_XRDML.encode())))
+    assert len(scans) == 2
+    xdata, ydata, axis, unit = scans[0]
+    assert (axis, unit) == ("2Theta", "deg")
+    assert list(xdata) == [10, 15, 20]
+    assert list(ydata) == [1, 2, 3]
+    xdata, ydata, axis, unit = scans[1]
+    assert axis == "Phi"
+    assert list(xdata) == [1, 2]
+    assert list(ydata) == [3, 5]
+
+
+def test_xrdml_invalid_values():
+    """Test if malformed values raise a ParseError."""
+    content = _XRDML.replace('seconds">2<', 'seconds">two<')
+    with pytest.raises(ParseError):
+        list(parse_file._iter_xrdml(io.BytesIO(content.encode())))
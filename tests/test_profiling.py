@@ -0,0 +1,34 @@
+"""Tests for profiling."""
+from graphs import profiling
+
+
+def test_timed(monkeypatch, tmp_path):
+    """Test if timed sections are recorded with calls, points and stacks."""
+    monkeypatch.setattr(profiling, "_enabled", True)
+    monkeypatch.setattr(profiling, "_records", {})
+    monkeypatch.setattr(profiling, "_stacks", {})
+    monkeypatch.setattr(profiling, "_output", str(tmp_path / "profile"))
+
+    @profiling.timed("outer", size=len)
+    def outer(values):
+        with profiling.section("inner", len(values)):
+            return values
+
+    outer([1, 2, 3])
+    outer([4])
+    assert profiling._records["outer"][0] == 2
+    assert profiling._records["outer"][3] == 4
+    assert set(profiling._stacks) == {"outer", "outer;inner"}
+    profiling.report()
+    lines = (tmp_path / "profile").read_text().splitlines()
+    assert [line.split()[0] for line in lines] == ["outer", "outer;inner"]
+
+
+def test_disabled(monkeypatch):
+    """Test if nothing is recorded when profiling is disabled."""
+    monkeypatch.setattr(profiling, "_enabled", False)
+    monkeypatch.setattr(profiling, "_records", {})
+    with profiling.section("section") as section:
+        section.size = 10
+    assert profiling.timed()(abs)(-1) == 1
+    assert profiling._records == {}
@@ -0,0 +1,56 @@
+"""Tests for saving and loading projects."""
+from gi.repository import Gio
+
+from graphs import project
+
+import numpy
+
+import pytest
+
+
+def _project_dict(xdata, ydata):
+    return {
+        "version": "1.0",
+        "data": [{"uuid": "a", "xdata": xdata, "ydata": ydata}],
+        "figure-settings": {},
+        "history-states": [[[[1, {"xdata": xdata, "ydata": ydata}]], []]],
+        "history-position": -1,
+        "view-history-states": [],
+        "view-history-position": -1,
+    }
+
+
+def test_container_roundtrip(tmp_path):
+    """Test that columns survive a save and load cycle."""
+    xdata = numpy.linspace(0, 10, 1001)
+    ydata = numpy.sin(xdata)
+    file = Gio.File.new_for_path(str(tmp_path / "project.graphs"))
+    project.save_project_dict(file, _project_dict(xdata, ydata))
+    project_dict = project.read_project_file(file)
+    item_dict = project_dict["data"][0]
+    assert project_dict["project-version"] == project.CURRENT_PROJECT_VERSION
+    assert numpy.array_equal(item_dict["xdata"], xdata)
+    assert numpy.array_equal(item_dict["ydata"], ydata)
+    history_dict = project_dict["history-states"][0][0][0][1]
+    assert numpy.array_equal(history_dict["ydata"], ydata)
+
+
+def test_migrate_v2():
+    """Test that list data from version 2 is converted to arrays."""
+    project_dict = _project_dict([1, 2, 3], [4, 5, 6])
+    project_dict["project-version"] = 2
+    project_dict = project.ProjectMigrator(project_dict).migrate()
+    assert isinstance(project_dict["data"][0]["xdata"], numpy.ndarray)
+    history_dict = project_dict["history-states"][0][0][0][1]
+    assert numpy.array_equal(history_dict["ydata"], [4, 5, 6])
+
+
+def test_truncated_container(tmp_path):
+    """Test that a truncated container raises a parse error."""
+    path = tmp_path / "project.graphs"
+    file = Gio.File.new_for_path(str(path))
+    xdata = numpy.arange(100.0)
+    project.save_project_dict(file, _project_dict(xdata, xdata))
+    path.write_bytes(path.read_bytes()[:-256])
+    with pytest.raises(project.ProjectParseError):
+        project.read_project_file(file)
@@ -0,0 +1,63 @@
+"""Tests for the style cache."""
+import pickle
+
+from gi.repository import GLib, Gio
+
+from graphs import style_cache, style_io
+
+from matplotlib import RcParams
+
+
+def test_parse_cached(tmp_path, monkeypatch):
+    """Test if styles are only parsed again after they changed."""
+    monkeypatch.setattr(GLib, "get_user_cache_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(style_cache, "_entries", {})
+    parsed = []
+
+    def parse(file):
+        parsed.append(file.get_basename())
+        return RcParams({"lines.linewidth": 2}), {"name": "Test"}
+
+    monkeypatch.setattr(style_io, "parse", parse)
+    path = tmp_path / "test.mplstyle"
+    path.write_text("lines.linewidth: 2\n")
+    file = Gio.File.new_for_path(str(path))
+    validate = RcParams({"lines.linewidth": 1, "lines.markersize": 3})
+    style, graphs_params = style_cache.parse(file, validate)
+    assert style["lines.linewidth"] == 2
+    assert style["lines.markersize"] == 3
+    assert graphs_params == {"name": "Test"}
+    # Entries are loaded from disk in a new session
+    monkeypatch.setattr(style_cache, "_entries", {})
+    style_cache.parse(file)
+    assert len(parsed) == 1
+    path.write_text("lines.linewidth: 3\n")
+    style_cache.parse(file)
+    assert len(parsed) == 2
+
+
+def test_corrupt_entry(tmp_path, monkeypatch):
+    """Test if entries that cannot be unpickled are discarded."""
+    monkeypatch.setattr(GLib, "get_user_cache_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(style_cache, "_entries", {})
+    monkeypatch.setattr(
+        style_io, "parse",
+        lambda _file: (RcParams({"lines.linewidth": 2}), {"name": "Test"}),
+    )
+    path = tmp_path / "test.mplstyle"
+    path.write_text("lines.linewidth: 2\n")
+    file = Gio.File.new_for_path(str(path))
+    cache_file = style_cache._get_cache_file(file)
+    cache_file.get_parent().make_directory_with_parents(None)
+    # A matching key, with an entry referring to a module that is gone
+    contents = pickle.dumps(
+        (style_cache._get_key(file), b"\x80\x04cmissing_module\nEntry\n."),
+    )
+    cache_file.replace_contents(
+        contents, None, False, Gio.FileCreateFlags.NONE, None,
+    )
+    assert style_cache.parse(file)[0]["lines.linewidth"] == 2
+    # The entry is replaced by a valid one
+    monkeypatch.setattr(style_cache, "_entries", {})
+    monkeypatch.setattr(style_io, "parse", None)
+    assert style_cache.parse(file)[1] == {"name": "Test"}
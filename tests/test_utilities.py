@@ -0,0 +1,37 @@
+"""Tests for utilities."""
+from graphs import utilities
+from graphs.item import DataItem
+
+import numpy
+
+
+def test_get_extents():
+    """Test if get_extents ignores non-finite and non-positive values."""
+    array = numpy.array([numpy.nan, 0, 3, -numpy.inf, 2, 0])
+    assert utilities.get_extents(array) == (0, 3, 2)
+    assert utilities.get_extents(numpy.array([-1, 0, 1.])) == (-1, 1, 1)
+    assert utilities.get_extents(numpy.array([-2, -1.])) == (-2, -1, None)
+    assert utilities.get_extents(numpy.array([0.])) == (0, 0, None)
+    assert utilities.get_extents(numpy.array([numpy.nan])) == \
+        (None, None, None)
+
+
+def test_item_extents():
+    """Test if the extents of items are updated with their data."""
+    item_ = DataItem(xdata=[1, 2, 3], ydata=[4, 5, 6])
+    assert item_.get_extents("xdata") == (1, 3, 1)
+    assert item_.get_extents("ydata") == (4, 6, 4)
+    item_.props.ydata = [0, 10]
+    assert item_.get_extents("xdata") == (1, 3, 1)
+    assert item_.get_extents("ydata") == (0, 10, 10)
+
+
+def test_equation_to_data_steps():
+    """Test if equations are evenly spaced unless steps is None."""
+    xdata, ydata = utilities.equation_to_data("sin(x)", (0, 10))
+    assert len(xdata) == 5000
+    numpy.testing.assert_allclose(numpy.diff(xdata), 10 / 4999)
+    numpy.testing.assert_allclose(ydata, numpy.sin(xdata))
+    xdata, ydata = utilities.equation_to_data("x", (0, 10), None)
+    assert 1 < len(xdata) < 5000
+    numpy.testing.assert_allclose(ydata, xdata)